@@ -0,0 +1,230 @@
+"""
+        _~_
+       (o o)   diegodebian
+      /  V  \────────────────────────────────────
+     /(  _  )\  URL Shortener API (MVP)
+       ^^ ^^     FastAPI • PostgreSQL • Docker • Nginx
+
+File   : admission.py
+Author : Diego Parra
+Web    : https://diegodebian.online
+─────────────────────────────────────────────────
+
+In-app admission control with priority load shedding.
+
+Every route shares the same database pool, so when Postgres slows down all
+requests queue behind each other. This ASGI middleware sorts requests into
+route classes and admits them against a shared concurrency budget:
+
+    redirect  >  auth  >  create  >  analytics (stats / admin / export)
+
+- Each class has its own concurrency cap, a bounded wait queue and a
+  maximum wait time.
+- Freed slots always go to the highest-priority class that can run.
+- When a queue is full or the wait expires the request is shed right away
+  with 503 + Retry-After instead of piling up on the pool.
+
+Lower classes get smaller caps, queues and waits, so under overload
+analytics degrades first and redirects keep flowing.
+"""
+
+import asyncio
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Deque, Dict, Optional
+
+from .config import (
+    ADMISSION_MAX_CONCURRENCY,
+    ADMISSION_RETRY_AFTER,
+    ADMISSION_ROUTE_CLASSES,
+)
+
+# Paths that never touch the database and are never shed
+EXEMPT_PREFIXES = ("/api/health", "/static/", "/redoc", "/docs", "/openapi.json")
+
+
+@dataclass
+class RouteClass:
+    name: str
+    priority: int          # lower value = served first
+    max_concurrent: int
+    max_queue: int
+    max_wait: float        # seconds
+
+
+def classify(method: str, path: str) -> Optional[str]:
+    """Map a request to its route class, or None if it is exempt."""
+    if path.startswith(EXEMPT_PREFIXES):
+        return None
+    if path.startswith("/api/auth/") or path == "/api/me":
+        return "auth"
+    if path == "/api/urls" and method == "POST":
+        return "create"
+    if path.startswith("/api/"):
+        return "analytics"
+    # Anything else with a single path segment is a /{short_code} redirect
+    if path.count("/") == 1 and len(path) > 1:
+        return "redirect"
+    return None
+
+
+class AdmissionController:
+    """Shared concurrency budget with per-class caps and priority hand-off."""
+
+    def __init__(self, capacity: int, classes: Dict[str, RouteClass]):
+        self.capacity = capacity
+        self.classes = classes
+        self._by_priority = sorted(classes.values(), key=lambda rc: rc.priority)
+        self.in_use = 0
+        self._in_flight = {name: 0 for name in classes}
+        self._queues: Dict[str, Deque[asyncio.Future]] = {name: deque() for name in classes}
+        self._stats = {
+            name: {"admitted": 0, "shed_queue_full": 0, "shed_timeout": 0, "wait_seconds": 0.0}
+            for name in classes
+        }
+
+    def _can_run(self, name: str) -> bool:
+        return (
+            self.in_use < self.capacity
+            and self._in_flight[name] < self.classes[name].max_concurrent
+        )
+
+    def _higher_waiting(self, priority: int) -> bool:
+        """
+        True if a class of equal or higher priority has waiters that could use
+        a freed slot. Waiters held back only by their own class cap don't
+        block lower classes from idle budget.
+        """
+        return any(
+            self._queues[rc.name] and self._in_flight[rc.name] < rc.max_concurrent
+            for rc in self._by_priority
+            if rc.priority <= priority
+        )
+
+    def _grant(self, name: str) -> None:
+        self.in_use += 1
+        self._in_flight[name] += 1
+        self._stats[name]["admitted"] += 1
+
+    async def acquire(self, name: str) -> bool:
+        """Wait for a slot. Returns False if the request should be shed."""
+        rc = self.classes[name]
+        if self._can_run(name) and not self._higher_waiting(rc.priority):
+            self._grant(name)
+            return True
+
+        queue = self._queues[name]
+        if len(queue) >= rc.max_queue:
+            self._stats[name]["shed_queue_full"] += 1
+            return False
+
+        fut = asyncio.get_running_loop().create_future()
+        queue.append(fut)
+        started = time.monotonic()
+        try:
+            await asyncio.wait({fut}, timeout=rc.max_wait)
+        except asyncio.CancelledError:
+            # Client went away while queued; give back a slot we may have received
+            if fut.done() and not fut.cancelled():
+                self.release(name)
+            else:
+                self._discard(name, fut)
+            raise
+        finally:
+            self._stats[name]["wait_seconds"] += time.monotonic() - started
+
+        if fut.done():
+            return True  # slot was handed over by release()
+        self._discard(name, fut)
+        self._stats[name]["shed_timeout"] += 1
+        return False
+
+    def _discard(self, name: str, fut: asyncio.Future) -> None:
+        try:
+            self._queues[name].remove(fut)
+        except ValueError:
+            pass
+        fut.cancel()
+
+    def release(self, name: str) -> None:
+        self.in_use -= 1
+        self._in_flight[name] -= 1
+        # Hand freed capacity to the highest-priority waiters first
+        for rc in self._by_priority:
+            queue = self._queues[rc.name]
+            while queue and self._can_run(rc.name):
+                fut = queue.popleft()
+                if fut.done():
+                    continue
+                self._grant(rc.name)
+                fut.set_result(True)
+
+    def snapshot(self) -> dict:
+        """Current counters, exposed on /api/health/admission."""
+        return {
+            "capacity": self.capacity,
+            "in_use": self.in_use,
+            "classes": {
+                rc.name: {
+                    "priority": rc.priority,
+                    "max_concurrent": rc.max_concurrent,
+                    "max_queue": rc.max_queue,
+                    "max_wait_seconds": rc.max_wait,
+                    "in_flight": self._in_flight[rc.name],
+                    "queued": len(self._queues[rc.name]),
+                    "admitted": self._stats[rc.name]["admitted"],
+                    "shed_queue_full": self._stats[rc.name]["shed_queue_full"],
+                    "shed_timeout": self._stats[rc.name]["shed_timeout"],
+                    "wait_seconds_total": round(self._stats[rc.name]["wait_seconds"], 3),
+                }
+                for rc in self._by_priority
+            },
+        }
+
+
+controller = AdmissionController(
+    ADMISSION_MAX_CONCURRENCY,
+    {
+        name: RouteClass(name=name, priority=priority, max_concurrent=limit, max_queue=queue, max_wait=wait)
+        for priority, (name, limit, queue, wait) in enumerate(ADMISSION_ROUTE_CLASSES)
+    },
+)
+
+_SHED_BODY = b'{"detail":"Service temporarily overloaded, please retry"}'
+
+
+class AdmissionMiddleware:
+    """Pure ASGI middleware that admits or sheds requests via the controller."""
+
+    def __init__(self, app, admission: AdmissionController = controller):
+        self.app = app
+        self.admission = admission
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        name = classify(scope["method"], scope["path"])
+        if name is None:
+            await self.app(scope, receive, send)
+            return
+
+        if not await self.admission.acquire(name):
+            await send({
+                "type": "http.response.start",
+                "status": 503,
+                "headers": [
+                    (b"content-type", b"application/json"),
+                    (b"content-length", str(len(_SHED_BODY)).encode()),
+                    (b"retry-after", str(ADMISSION_RETRY_AFTER).encode()),
+                ],
+            })
+            await send({"type": "http.response.body", "body": _SHED_BODY})
+            return
+
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.admission.release(name)
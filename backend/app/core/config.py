@@ -17,6 +17,12 @@ import sys
 ENVIRONMENT = os.getenv("ENVIRONMENT", "development").lower()
 IS_PRODUCTION = ENVIRONMENT in ("production", "prod")
 
+
+def _env_flag(name: str, default: str = "false") -> bool:
+    """Read a boolean feature flag from the environment."""
+    return os.getenv(name, default).strip().lower() in ("1", "true", "yes", "on")
+
+
 # Database connection settings
 DB_USER = os.getenv("DB_USER", "shortener_user")
 DB_PASSWORD = os.getenv("DB_PASSWORD", "change_me")
@@ -28,11 +34,93 @@ DATABASE_URL = (
     f"postgresql+asyncpg://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
 )
 
+# Sharding of urls/clicks/click_rollups (see app/sharding.py). Shard 0 is
+# always DB_NAME, which also keeps the users table; list any extra shard
+# databases here (same host/credentials unless SHARD_DB_HOSTS is set).
+SHARD_DB_NAMES = [name.strip() for name in os.getenv("SHARD_DB_NAMES", "").split(",") if name.strip()]
+SHARD_DB_HOSTS = [host.strip() for host in os.getenv("SHARD_DB_HOSTS", "").split(",") if host.strip()]
+
+SHARD_DATABASE_URLS = [DATABASE_URL] + [
+    f"postgresql+asyncpg://{DB_USER}:{DB_PASSWORD}@"
+    f"{SHARD_DB_HOSTS[i] if i < len(SHARD_DB_HOSTS) else DB_HOST}:{DB_PORT}/{name}"
+    for i, name in enumerate(SHARD_DB_NAMES)
+]
+# Short codes encode offset + local_id * SHARD_CODE_SLOTS + shard. Slots is
+# fixed once codes are issued (pick it larger than the shard count to leave
+# room); codes below the offset are pre-sharding codes and live on shard 0.
+SHARD_CODE_SLOTS = int(os.getenv("SHARD_CODE_SLOTS", "1"))
+SHARD_CODE_OFFSET = int(os.getenv("SHARD_CODE_OFFSET", "0"))
+
+# Optional read replica for analytics/admin reads (unset = everything on primary)
+READ_DB_HOST = os.getenv("READ_DB_HOST", "")
+READ_DB_PORT = os.getenv("READ_DB_PORT", DB_PORT)
+READ_DB_USER = os.getenv("READ_DB_USER", DB_USER)
+READ_DB_PASSWORD = os.getenv("READ_DB_PASSWORD", DB_PASSWORD)
+READ_DB_NAME = os.getenv("READ_DB_NAME", DB_NAME)
+
+READ_DATABASE_URL = (
+    f"postgresql+asyncpg://{READ_DB_USER}:{READ_DB_PASSWORD}@{READ_DB_HOST}:{READ_DB_PORT}/{READ_DB_NAME}"
+    if READ_DB_HOST else None
+)
+# Fall back to the primary when the replica is further behind than this
+READ_REPLICA_MAX_LAG_SECONDS = float(os.getenv("READ_REPLICA_MAX_LAG_SECONDS", "5"))
+# How often the replica lag is re-checked (the result is cached in between)
+READ_REPLICA_CHECK_SECONDS = float(os.getenv("READ_REPLICA_CHECK_SECONDS", "5"))
+
 # JWT and auth settings
 SECRET_KEY = os.getenv("SECRET_KEY", "super_secret_key_for_dev_only")
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "30"))
 ALGORITHM = "HS256"
 
+# Response serialization: encode trusted payloads with orjson and skip the
+# second response_model validation pass (see app/serialization.py)
+FAST_JSON_RESPONSES = _env_flag("FAST_JSON_RESPONSES")
+
+# Serve GET /{short_code} from a raw ASGI handler ahead of FastAPI routing
+# (see app/fast_redirect.py)
+FAST_REDIRECT = _env_flag("FAST_REDIRECT")
+
+# Return the existing short URL when a user re-submits the same long URL
+# (can be overridden per request with the "dedupe" field)
+URL_DEDUP = _env_flag("URL_DEDUP")
+
+# Maximum number of buckets returned by the stats endpoint
+STATS_MAX_POINTS = int(os.getenv("STATS_MAX_POINTS", "500"))
+
+# Rows fetched per server-side cursor batch when exporting clicks
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "2000"))
+
+# Bulk admin operations: rows per UPDATE/transaction and max rows per request
+BULK_CHUNK_SIZE = int(os.getenv("BULK_CHUNK_SIZE", "1000"))
+BULK_MAX_ITEMS = int(os.getenv("BULK_MAX_ITEMS", "100000"))
+# Request bodies above this are rejected before being read in full
+BULK_MAX_BODY_BYTES = int(os.getenv("BULK_MAX_BODY_BYTES", str(32 * 1024 * 1024)))
+
+# Admission control (see app/core/admission.py)
+ADMISSION_CONTROL = _env_flag("ADMISSION_CONTROL")
+# Shared budget; defaults to the SQLAlchemy pool size (5) + max_overflow (10)
+ADMISSION_MAX_CONCURRENCY = int(os.getenv("ADMISSION_MAX_CONCURRENCY", "15"))
+ADMISSION_RETRY_AFTER = int(os.getenv("ADMISSION_RETRY_AFTER", "2"))
+
+
+def _route_class(name: str, limit: int, queue: int, wait_ms: int) -> tuple:
+    prefix = f"ADMISSION_{name.upper()}"
+    return (
+        name,
+        int(os.getenv(f"{prefix}_CONCURRENCY", str(limit))),
+        int(os.getenv(f"{prefix}_QUEUE", str(queue))),
+        int(os.getenv(f"{prefix}_WAIT_MS", str(wait_ms))) / 1000,
+    )
+
+
+# (name, max concurrent, max queued, max wait) in priority order
+ADMISSION_ROUTE_CLASSES = [
+    _route_class("redirect", 15, 200, 2000),
+    _route_class("auth", 8, 50, 2000),
+    _route_class("create", 6, 50, 1000),
+    _route_class("analytics", 4, 20, 500),
+]
+
 # Known insecure SECRET_KEY values - must not be used in production
 INSECURE_SECRET_KEYS = {
     "",
@@ -59,3 +147,42 @@ if IS_PRODUCTION:
         print("  3. Restart the application", file=sys.stderr)
         print("=" * 60, file=sys.stderr)
         sys.exit(1)
+
+# Short-code Bloom filter (see app/services/code_filter.py)
+CODE_FILTER_ENABLED = _env_flag("CODE_FILTER_ENABLED")
+CODE_FILTER_SNAPSHOT = os.getenv("CODE_FILTER_SNAPSHOT", "data/code_filter.bin")
+CODE_FILTER_CAPACITY = int(os.getenv("CODE_FILTER_CAPACITY", "1000000"))
+CODE_FILTER_ERROR_RATE = float(os.getenv("CODE_FILTER_ERROR_RATE", "0.001"))
+CODE_FILTER_REFRESH_SECONDS = int(os.getenv("CODE_FILTER_REFRESH_SECONDS", "30"))
+# Codes up to this many ids above the watermark are sent to the database
+CODE_FILTER_HORIZON = int(os.getenv("CODE_FILTER_HORIZON", "10000"))
+
+# Durable click spool (see app/services/click_spool.py)
+CLICK_SPOOL_ENABLED = _env_flag("CLICK_SPOOL_ENABLED")
+CLICK_SPOOL_DIR = os.getenv("CLICK_SPOOL_DIR", "data/click_spool")
+# Active segment is sealed (and becomes replayable) at this size
+CLICK_SPOOL_SEGMENT_BYTES = int(os.getenv("CLICK_SPOOL_SEGMENT_BYTES", str(16 * 1024 * 1024)))
+# Stop accepting events once unreplayed segments reach this size
+CLICK_SPOOL_MAX_BYTES = int(os.getenv("CLICK_SPOOL_MAX_BYTES", str(1024 * 1024 * 1024)))
+# Extra time the writer waits to gather more events into one fsync (0 = group commit only)
+CLICK_SPOOL_FSYNC_MS = int(os.getenv("CLICK_SPOOL_FSYNC_MS", "0"))
+# Events per replay transaction and pause between replay passes
+CLICK_SPOOL_REPLAY_BATCH = int(os.getenv("CLICK_SPOOL_REPLAY_BATCH", "500"))
+CLICK_SPOOL_REPLAY_SECONDS = float(os.getenv("CLICK_SPOOL_REPLAY_SECONDS", "1"))
+# With the spool on, a redirect for a cached code stops waiting for the
+# database after this long and is served from the resolution cache
+CLICK_SPOOL_DB_TIMEOUT_MS = int(os.getenv("CLICK_SPOOL_DB_TIMEOUT_MS", "1000"))
+
+# Recently resolved short codes, used to keep redirects up during DB errors
+RESOLUTION_CACHE_SIZE = int(os.getenv("RESOLUTION_CACHE_SIZE", "100000"))
+RESOLUTION_CACHE_TTL_SECONDS = int(os.getenv("RESOLUTION_CACHE_TTL_SECONDS", "300"))
+
+# Static files: serve /static from memory with precompressed variants (see app/static_assets.py)
+STATIC_PRECOMPRESS = _env_flag("STATIC_PRECOMPRESS")
+# Compressed variants are cached here by content hash between restarts
+STATIC_CACHE_DIR = os.getenv("STATIC_CACHE_DIR", "data/static_cache")
+# Variants compressed at maximum quality at image build time
+# (python -m app.static_assets), used before anything is compressed at startup
+STATIC_PREBUILT_DIR = os.getenv("STATIC_PREBUILT_DIR", "static_precompressed")
+# Brotli quality for variants compressed at startup (11 takes seconds on the ReDoc bundle)
+STATIC_BROTLI_QUALITY = int(os.getenv("STATIC_BROTLI_QUALITY", "5"))
@@ -11,11 +11,19 @@ Web    : https://diegodebian.online
 ─────────────────────────────────────────────────
 """
 
+import asyncio
+import time
 from typing import AsyncGenerator
+from sqlalchemy import text
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.orm import sessionmaker
 
-from .core.config import DATABASE_URL
+from .core.config import (
+    DATABASE_URL,
+    READ_DATABASE_URL,
+    READ_REPLICA_MAX_LAG_SECONDS,
+    READ_REPLICA_CHECK_SECONDS,
+)
 
 engine = create_async_engine(DATABASE_URL, echo=False, future=True)
 
@@ -23,7 +31,79 @@ AsyncSessionLocal = sessionmaker(
     engine, expire_on_commit=False, class_=AsyncSession
 )
 
+# Optional read-only engine (READ_DB_HOST). Only used for reads that can
+# tolerate a little replication lag: stats, admin listings.
+read_engine = (
+    create_async_engine(READ_DATABASE_URL, echo=False, future=True)
+    if READ_DATABASE_URL else None
+)
+
+ReadSessionLocal = (
+    sessionmaker(read_engine, expire_on_commit=False, class_=AsyncSession)
+    if read_engine is not None else None
+)
+
+# Primary's current WAL position; the replica must have replayed up to it to count as caught up
+_PRIMARY_LSN_QUERY = text("SELECT CAST(pg_current_wal_lsn() AS TEXT)")
+
+# On the replica: caught up to the primary's position, seconds since the last
+# replayed transaction, and whether the WAL receiver is connected
+_REPLICA_STATE_QUERY = text("""
+    SELECT
+        NOT pg_is_in_recovery()
+            OR pg_wal_lsn_diff(CAST(:primary_lsn AS pg_lsn), pg_last_wal_replay_lsn()) <= 0 AS caught_up,
+        COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) AS replay_age,
+        NOT pg_is_in_recovery()
+            OR EXISTS (SELECT 1 FROM pg_stat_wal_receiver WHERE status = 'streaming') AS streaming
+""")
+
+# Covers connecting to both servers as well as the queries
+REPLICA_CHECK_TIMEOUT = 1.0
+
+replica_status = {"usable": False, "lag_seconds": None, "checked_at": 0.0, "error": None}
+
+
+async def _replica_lag() -> float:
+    """Seconds the replica is behind the primary (0 when caught up)."""
+    async with engine.connect() as conn:
+        primary_lsn = await conn.scalar(_PRIMARY_LSN_QUERY)
+    async with read_engine.connect() as conn:
+        state = (await conn.execute(_REPLICA_STATE_QUERY, {"primary_lsn": primary_lsn})).one()
+    if state.caught_up:
+        return 0.0
+    if not state.streaming:
+        # Behind and not receiving WAL: it will not catch up on its own
+        raise ConnectionError("replica WAL receiver is not streaming")
+    return float(state.replay_age)
+
+
+async def replica_usable() -> bool:
+    """Whether reads can go to the replica. The lag check is cached briefly."""
+    if read_engine is None:
+        return False
+    now = time.monotonic()
+    if now - replica_status["checked_at"] < READ_REPLICA_CHECK_SECONDS:
+        return replica_status["usable"]
+    # Mark as checked first so concurrent requests don't all run the query
+    replica_status["checked_at"] = now
+    try:
+        lag = await asyncio.wait_for(_replica_lag(), timeout=REPLICA_CHECK_TIMEOUT)
+        replica_status.update(
+            usable=lag <= READ_REPLICA_MAX_LAG_SECONDS,
+            lag_seconds=lag,
+            error=None,
+        )
+    except Exception as exc:
+        replica_status.update(usable=False, lag_seconds=None, error=type(exc).__name__)
+    return replica_status["usable"]
+
+
 async def get_session() -> AsyncGenerator[AsyncSession, None]:
     """Yield an async database session."""
     async with AsyncSessionLocal() as session:
-        yield session
\ No newline at end of file
+        yield session
+
+
+async def read_session_factory() -> sessionmaker:
+    """Session factory for read-only work: replica if configured and caught up, else primary."""
+    return ReadSessionLocal if await replica_usable() else AsyncSessionLocal
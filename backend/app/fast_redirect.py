@@ -0,0 +1,102 @@
+"""
+        _~_
+       (o o)   diegodebian
+      /  V  \────────────────────────────────────
+     /(  _  )\  URL Shortener API (MVP)
+       ^^ ^^     FastAPI • PostgreSQL • Docker • Nginx
+
+File   : fast_redirect.py
+Author : Diego Parra
+Web    : https://diegodebian.online
+─────────────────────────────────────────────────
+
+Raw ASGI fast path for GET /{short_code}.
+
+Through FastAPI a redirect is routed past every other route, runs dependency
+injection for the session, builds a Request and a RedirectResponse, and
+passes through the exception middleware. This middleware matches the
+short-code path shape itself, opens a pooled session on the code's shard,
+calls the same redirect_service.get_redirect and writes the 302 directly.
+Any other request falls through to FastAPI untouched.
+
+Responses match the FastAPI route: the same Location quoting, and
+HTTPException errors as {"detail": ...} JSON with their status and headers.
+Other exceptions propagate to the server error middleware as before.
+"""
+
+import re
+from typing import Optional
+from urllib.parse import quote
+
+from fastapi import HTTPException
+
+from .serialization import dumps
+from .services import redirect_service
+from .sharding import shard_for_code, shards
+
+# Same alphabet and length limit the code filter accepts
+_CODE_PATH = re.compile(r"/[0-9A-Za-z]{1,16}")
+# Single-segment paths served by the app itself, not redirects
+RESERVED_PATHS = frozenset(("/docs", "/redoc", "/static"))
+# Characters RedirectResponse leaves unquoted in the Location header
+_LOCATION_SAFE = ":/%#?=@[]!$&'()*+,;"
+
+
+def _header(headers, name: bytes) -> Optional[str]:
+    for key, value in headers:
+        if key == name:
+            return value.decode("latin-1")
+    return None
+
+
+class FastRedirectMiddleware:
+    """Pure ASGI middleware serving short-code redirects without the router."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "GET":
+            await self.app(scope, receive, send)
+            return
+        path = scope["path"]
+        if not _CODE_PATH.fullmatch(path) or path in RESERVED_PATHS:
+            await self.app(scope, receive, send)
+            return
+
+        short_code = path[1:]
+        headers = scope["headers"]
+        client = scope.get("client")
+        try:
+            # The session only takes a pooled connection once a query runs
+            async with shards[shard_for_code(short_code)].session_factory() as session:
+                long_url = await redirect_service.get_redirect(
+                    session,
+                    short_code,
+                    _header(headers, b"referer"),
+                    _header(headers, b"user-agent"),
+                    # Nginx forwards the real client address in X-Real-IP
+                    _header(headers, b"x-real-ip") or (client[0] if client else None),
+                )
+        except HTTPException as exc:
+            await self._send_error(send, exc)
+            return
+
+        await send({
+            "type": "http.response.start",
+            "status": 302,
+            "headers": [
+                (b"content-length", b"0"),
+                (b"location", quote(long_url, safe=_LOCATION_SAFE).encode("latin-1")),
+            ],
+        })
+        await send({"type": "http.response.body", "body": b""})
+
+    @staticmethod
+    async def _send_error(send, exc: HTTPException) -> None:
+        body = dumps({"detail": exc.detail})
+        headers = [(b"content-length", str(len(body)).encode()), (b"content-type", b"application/json")]
+        for name, value in (exc.headers or {}).items():
+            headers.append((name.lower().encode("latin-1"), value.encode("latin-1")))
+        await send({"type": "http.response.start", "status": exc.status_code, "headers": headers})
+        await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,73 @@
+"""
+        _~_
+       (o o)   diegodebian
+      /  V  \────────────────────────────────────
+     /(  _  )\  URL Shortener API (MVP)
+       ^^ ^^     FastAPI • PostgreSQL • Docker • Nginx
+
+File   : hll.py
+Author : Diego Parra
+Web    : https://diegodebian.online
+─────────────────────────────────────────────────
+
+HyperLogLog sketches for approximate unique-visitor counts.
+
+A sketch is 2^PRECISION one-byte registers (2 KB, ~2.3% standard error)
+stored as bytea on the daily click rollups. Each click updates a single
+register, which Postgres can do in place with set_byte/get_byte, and
+sketches for any date range merge by taking the register-wise maximum.
+"""
+
+import hashlib
+import math
+from typing import Iterable, Optional, Tuple
+
+from .core.config import SECRET_KEY
+
+PRECISION = 11
+NUM_REGISTERS = 1 << PRECISION
+_HASH_BITS = 64
+_REMAINING_BITS = _HASH_BITS - PRECISION
+
+# Keyed hash so stored sketches can't be matched against known IPs
+_VISITOR_KEY = hashlib.sha256(SECRET_KEY.encode()).digest()
+
+
+def visitor_hash(ip: Optional[str], user_agent: Optional[str]) -> Optional[int]:
+    """64-bit keyed hash of the visitor identity (IP + user agent)."""
+    if not ip and not user_agent:
+        return None
+    data = f"{ip or ''}|{user_agent or ''}".encode()
+    return int.from_bytes(hashlib.blake2b(data, key=_VISITOR_KEY, digest_size=8).digest(), "big")
+
+
+def register_update(hashed: int) -> Tuple[int, int]:
+    """Register index and value (leading zeros + 1) a hash contributes."""
+    index = hashed >> _REMAINING_BITS
+    rest = hashed & ((1 << _REMAINING_BITS) - 1)
+    rank = _REMAINING_BITS - rest.bit_length() + 1
+    return index, rank
+
+
+def empty() -> bytearray:
+    return bytearray(NUM_REGISTERS)
+
+
+def merge(sketches: Iterable[Optional[bytes]]) -> bytes:
+    """Register-wise maximum of several sketches (None entries are skipped)."""
+    merged = bytes(NUM_REGISTERS)
+    for sketch in sketches:
+        if sketch is not None and len(sketch) == NUM_REGISTERS:
+            merged = bytes(map(max, merged, sketch))
+    return merged
+
+
+def estimate(sketch: bytes) -> int:
+    """Cardinality estimate with the small-range (linear counting) correction."""
+    m = NUM_REGISTERS
+    alpha = 0.7213 / (1 + 1.079 / m)
+    raw = alpha * m * m / sum(2.0 ** -register for register in sketch)
+    zeros = sketch.count(0)
+    if raw <= 2.5 * m and zeros:
+        return round(m * math.log(m / zeros))
+    return round(raw)
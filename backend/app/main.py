@@ -15,6 +15,22 @@ Web    : https://diegodebian.online
 from fastapi import FastAPI
 from .database import engine
 from .models import Base
+from .core.config import (
+    ADMISSION_CONTROL,
+    CLICK_SPOOL_ENABLED,
+    CODE_FILTER_ENABLED,
+    FAST_REDIRECT,
+    STATIC_BROTLI_QUALITY,
+    STATIC_CACHE_DIR,
+    STATIC_PREBUILT_DIR,
+    STATIC_PRECOMPRESS,
+)
+from .core.admission import AdmissionMiddleware
+from .fast_redirect import FastRedirectMiddleware
+from .services.click_spool import click_spool
+from .services.code_filter import code_filter
+from .sharding import create_shard_tables, shards
+from .static_assets import PrecompressedStatic
 
 from fastapi.staticfiles import StaticFiles
 from fastapi.responses import HTMLResponse
@@ -22,6 +38,15 @@ from fastapi.responses import HTMLResponse
 
 app = FastAPI(title="URL Shortener MVP", version="0.1.0", redoc_url=None)
 
+# Redirects without FastAPI routing (opt-in). Added first so admission
+# control, when enabled, still wraps it.
+if FAST_REDIRECT:
+    app.add_middleware(FastRedirectMiddleware)
+
+# Priority load shedding when the database is saturated (opt-in)
+if ADMISSION_CONTROL:
+    app.add_middleware(AdmissionMiddleware)
+
 from .routers import health, urls, redirect, auth, admin
 
 app.include_router(health.router)
@@ -32,12 +57,22 @@ app.include_router(urls.router)
 # Serve static files (needs to be before the redirect router)
 from pathlib import Path
 static_dir = Path(__file__).parent / "static"
-app.mount("/static", StaticFiles(directory=str(static_dir)), name="static")
+if STATIC_PRECOMPRESS:
+    # Loaded and compressed once here; requests are served from memory
+    static_files = PrecompressedStatic(
+        str(static_dir),
+        cache_dir=STATIC_CACHE_DIR,
+        prebuilt_dir=STATIC_PREBUILT_DIR,
+        brotli_quality=STATIC_BROTLI_QUALITY,
+    )
+    redoc_script = static_files.url("redoc.standalone.js")
+else:
+    static_files = StaticFiles(directory=str(static_dir))
+    redoc_script = "/static/redoc.standalone.js"
+app.mount("/static", static_files, name="static")
 
-# Offline ReDoc documentation (must come before redirect router)
-@app.get("/redoc", response_class=HTMLResponse, include_in_schema=False)
-async def redoc_html():
-    return """
+# Offline ReDoc documentation, rendered once (must come before redirect router)
+REDOC_HTML = f"""
     <!DOCTYPE html>
     <html>
     <head>
@@ -47,10 +82,15 @@ async def redoc_html():
     </head>
     <body>
         <redoc spec-url="/openapi.json"></redoc>
-        <script src="/static/redoc.standalone.js"></script>
+        <script src="{redoc_script}"></script>
     </body>
     </html>
-    """
+    """.encode()
+
+
+@app.get("/redoc", response_class=HTMLResponse, include_in_schema=False)
+async def redoc_html():
+    return HTMLResponse(REDOC_HTML, headers={"Cache-Control": "no-cache"})
 
 # Redirect router comes last since it matches any /{short_code}
 app.include_router(redirect.router)
@@ -63,4 +103,21 @@ async def startup_event():
     # Auto-create tables on startup. Use Alembic for production.
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
+    # urls, clicks and click_rollups on the extra shards (if any)
+    await create_shard_tables()
+
+    # Load the short-code filter so unknown codes 404 without a DB round-trip
+    if CODE_FILTER_ENABLED:
+        await code_filter.start([shard.engine for shard in shards])
+
+    # Click events go to the local spool first and are replayed into Postgres
+    if CLICK_SPOOL_ENABLED:
+        await click_spool.start([shard.session_factory for shard in shards])
+
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    if CODE_FILTER_ENABLED:
+        await code_filter.stop()
+    if CLICK_SPOOL_ENABLED:
+        await click_spool.stop()
@@ -12,7 +12,7 @@ Web    : https://diegodebian.online
 """
 
 from datetime import datetime
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, BigInteger, String, Boolean, DateTime, ForeignKey, LargeBinary, Index
 from sqlalchemy.orm import declarative_base, relationship
 
 Base = declarative_base()
@@ -44,10 +44,16 @@ class URL(Base):
     user_email = Column(String, nullable=True, index=True)
     click_count = Column(Integer, default=0)
     click_limit = Column(Integer, default=1000)
+    # First 8 bytes of sha256(long_url) as a signed 64-bit int, for dedup lookups
+    long_url_hash = Column(BigInteger, nullable=True)
 
     clicks = relationship("Click", back_populates="url")
     # No ORM relationship back to User, we use user_email directly
 
+    __table_args__ = (
+        Index("ix_urls_user_email_long_url_hash", "user_email", "long_url_hash"),
+    )
+
 
 class Click(Base):
     __tablename__ = "clicks"
@@ -58,5 +64,18 @@ class Click(Base):
     country = Column(String(2), nullable=True)
     referrer = Column(String, nullable=True)
     user_agent = Column(String, nullable=True)
+    # Set by the click spool so replays are idempotent (NULL for direct inserts)
+    event_id = Column(String(32), unique=True, nullable=True)
+
+    url = relationship("URL", back_populates="clicks")
+
+
+class ClickRollup(Base):
+    """Pre-aggregated click counts per URL at minute, hour and day resolution."""
+    __tablename__ = "click_rollups"
 
-    url = relationship("URL", back_populates="clicks")
\ No newline at end of file
+    url_id = Column(Integer, ForeignKey("urls.id", ondelete="CASCADE"), primary_key=True)
+    resolution = Column(String(6), primary_key=True)  # minute | hour | day
+    bucket = Column(DateTime, primary_key=True)       # bucket start (UTC)
+    clicks = Column(Integer, nullable=False, default=0)
+    visitors = Column(LargeBinary, nullable=True)     # HyperLogLog sketch, day rows only
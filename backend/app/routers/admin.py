@@ -14,20 +14,34 @@ Admin router with protected endpoints.
 All endpoints require JWT authentication and plan == 'admin'.
 """
 
-from typing import List
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from datetime import datetime
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Request
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import StreamingResponse
+from pydantic import ValidationError
 from sqlalchemy import select, desc
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from ..database import get_session
+from ..sharding import get_code_session, scatter, shard_for_code
 from ..models import User, URL
 from ..schemas import (
     User as UserSchema, 
     URLInfo, 
     PlanUpdate, 
     URLStatusUpdate, 
-    TopURLInfo
+    TopURLInfo,
+    BulkPlanUpdate,
+    BulkURLStatusUpdate,
+    BulkResult,
+    ExportFormat,
 )
+from ..services import bulk_service, export_service
+from ..services.resolution_cache import invalidate_codes, resolution_cache
+from ..core.config import BULK_MAX_BODY_BYTES, BULK_MAX_ITEMS
+from ..serialization import FastJSONResponse, url_info, top_url_info
+from ..core.config import FAST_JSON_RESPONSES
 from .auth import get_current_user
 
 router = APIRouter(prefix="/api/admin", tags=["Admin"])
@@ -99,7 +113,7 @@ async def update_user_plan(
 async def update_url_status(
     short_code: str,
     status_update: URLStatusUpdate,
-    session: AsyncSession = Depends(get_session),
+    session: AsyncSession = Depends(get_code_session),
     admin: User = Depends(require_admin)
 ):
     """
@@ -121,8 +135,11 @@ async def update_url_status(
     # Update status
     target_url.is_active = status_update.is_active
     await session.commit()
+    resolution_cache.invalidate([short_code])
     await session.refresh(target_url)
     
+    if FAST_JSON_RESPONSES:
+        return FastJSONResponse(url_info(target_url))
     return target_url
 
 
@@ -134,7 +151,6 @@ async def update_url_status(
 )
 async def get_top_urls(
     limit: int = Query(default=20, ge=1, le=100, description="Number of URLs to return"),
-    session: AsyncSession = Depends(get_session),
     admin: User = Depends(require_admin)
 ):
     """
@@ -142,20 +158,172 @@ async def get_top_urls(
     
     - **limit**: Maximum number of URLs to return (1-100, default 20)
     """
-    result = await session.execute(
-        select(URL)
-        .order_by(desc(URL.click_count))
-        .limit(limit)
-    )
-    urls = result.scalars().all()
+    async def top_on_shard(session: AsyncSession, shard: int):
+        # Only fetch the columns the response needs
+        result = await session.execute(
+            select(
+                URL.short_code,
+                URL.long_url,
+                URL.click_count,
+                URL.user_email,
+                URL.is_active,
+            )
+            .order_by(desc(URL.click_count))
+            .limit(limit)
+        )
+        return result.all()
+
+    # The global top N is among the top N of each shard
+    per_shard = await scatter(top_on_shard, read=True)
+    rows = [row for shard_rows in per_shard for row in shard_rows]
+    if len(per_shard) > 1:
+        rows = sorted(rows, key=lambda row: row.click_count or 0, reverse=True)[:limit]
     
+    if FAST_JSON_RESPONSES:
+        return FastJSONResponse([top_url_info(row) for row in rows])
     return [
         TopURLInfo(
-            short_code=url.short_code,
-            long_url=str(url.long_url),
-            click_count=url.click_count or 0,
-            user_email=url.user_email,
-            is_active=url.is_active
+            short_code=row.short_code,
+            long_url=str(row.long_url),
+            click_count=row.click_count or 0,
+            user_email=row.user_email,
+            is_active=row.is_active
         )
-        for url in urls
+        for row in rows
     ]
+
+
+# ============================================================
+# Bulk Admin Endpoints
+# ============================================================
+
+BULK_BODY_DESCRIPTION = (
+    "Accepts JSON ({items: [...]} or {filter: {...}, <value>}), "
+    "text/csv with a header row, or application/x-ndjson with one item per line."
+)
+
+
+async def _read_bulk_body(request: Request, schema):
+    """Parse a JSON, CSV or NDJSON request body into the given bulk schema."""
+    content_type = request.headers.get("content-type", "application/json").lower()
+    too_large = HTTPException(
+        status_code=413, detail=f"Request body too large, maximum is {BULK_MAX_BODY_BYTES} bytes"
+    )
+    content_length = request.headers.get("content-length", "")
+    if content_length.isdigit() and int(content_length) > BULK_MAX_BODY_BYTES:
+        raise too_large
+    # Chunked uploads carry no length; stop reading as soon as the limit is passed
+    chunks, size = [], 0
+    async for chunk in request.stream():
+        size += len(chunk)
+        if size > BULK_MAX_BODY_BYTES:
+            raise too_large
+        chunks.append(chunk)
+    body = b"".join(chunks)
+    try:
+        if "csv" in content_type or "ndjson" in content_type:
+            bulk = schema(items=bulk_service.parse_rows(body, content_type))
+        else:
+            bulk = schema.model_validate_json(body)
+    except ValidationError as exc:
+        raise RequestValidationError(exc.errors())
+    except ValueError as exc:
+        raise HTTPException(status_code=422, detail=f"Could not parse body: {exc}")
+
+    if bulk.items is not None and len(bulk.items) > BULK_MAX_ITEMS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Too many items ({len(bulk.items)}), maximum is {BULK_MAX_ITEMS}"
+        )
+    return bulk
+
+
+@router.post(
+    "/bulk/users/plan",
+    response_model=BulkResult,
+    summary="Bulk update user plans",
+    description="Change the plan of many users at once. " + BULK_BODY_DESCRIPTION
+)
+async def bulk_update_user_plans(
+    request: Request,
+    session: AsyncSession = Depends(get_session),
+    admin: User = Depends(require_admin)
+):
+    """
+    Apply plan changes in chunked, set-based UPDATEs.
+    
+    - **items**: list of {email, plan}
+    - **filter** + **plan**: users matching email_domain / plan / created range
+    """
+    bulk = await _read_bulk_body(request, BulkPlanUpdate)
+    if bulk.items is not None:
+        return await bulk_service.update_plans(
+            session, [item.email for item in bulk.items], [item.plan for item in bulk.items]
+        )
+    return await bulk_service.update_plans_by_filter(session, bulk.filter, bulk.plan)
+
+
+@router.post(
+    "/bulk/urls/status",
+    response_model=BulkResult,
+    summary="Bulk update URL status",
+    description="Enable or disable many short URLs at once. " + BULK_BODY_DESCRIPTION
+)
+async def bulk_update_url_status(
+    request: Request,
+    session: AsyncSession = Depends(get_session),
+    admin: User = Depends(require_admin)
+):
+    """
+    Apply status changes in chunked, set-based UPDATEs.
+    
+    - **items**: list of {short_code, is_active}
+    - **filter** + **is_active**: URLs matching user_email / domain / created range
+    """
+    bulk = await _read_bulk_body(request, BulkURLStatusUpdate)
+    if bulk.items is not None:
+        return await bulk_service.update_url_status(
+            session, [item.short_code for item in bulk.items], [item.is_active for item in bulk.items],
+            on_chunk=invalidate_codes,
+        )
+    return await bulk_service.update_url_status_by_filter(
+        session, bulk.filter, bulk.is_active, on_chunk=invalidate_codes
+    )
+
+
+# ============================================================
+# Click Export
+# ============================================================
+
+@router.get(
+    "/clicks/export",
+    summary="Export raw clicks",
+    description="Stream raw click events (all URLs or filtered) as CSV or NDJSON. Requires admin privileges."
+)
+async def export_all_clicks(
+    short_code: Optional[str] = Query(None, description="Only clicks of this short URL"),
+    user_email: Optional[str] = Query(None, description="Only clicks of URLs owned by this user"),
+    format: ExportFormat = Query("csv", description="csv or ndjson"),
+    from_: Optional[datetime] = Query(None, alias="from", description="Only clicks at or after this time"),
+    to: Optional[datetime] = Query(None, description="Only clicks before this time"),
+    gzip: bool = Query(False, description="Compress the export with gzip"),
+    admin: User = Depends(require_admin)
+):
+    """
+    Stream click events through a server-side cursor (constant memory).
+    
+    - **short_code** / **user_email**: optional filters
+    - **from** / **to**: optional time range
+    - **gzip**: compress on the fly
+    """
+    conditions = export_service.click_conditions(
+        short_code=short_code, user_email=user_email, from_=from_, to=to
+    )
+    filename = export_service.export_filename(short_code or "all", format, gzip)
+    return StreamingResponse(
+        export_service.stream_clicks(
+            conditions, format, gzip, [shard_for_code(short_code)] if short_code else None
+        ),
+        media_type="application/gzip" if gzip else export_service.MEDIA_TYPES[format],
+        headers=export_service.export_headers(filename),
+    )
@@ -16,12 +16,12 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
-from jose import JWTError, jwt
+from jose import JWTError
 
 from ..database import get_session
 from ..models import User
 from ..schemas import UserCreate, UserLogin, User as UserSchema, Token
-from ..core.security import verify_password, get_password_hash, create_access_token, SECRET_KEY, ALGORITHM
+from ..core.security import verify_password, get_password_hash, create_access_token, decode_access_token
 
 router = APIRouter()
 
@@ -35,7 +35,7 @@ async def get_current_user(token: str = Depends(oauth2_scheme), session: AsyncSe
         headers={"WWW-Authenticate": "Bearer"},
     )
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        payload = decode_access_token(token)
         email: str = payload.get("sub")
         if email is None:
             raise credentials_exception
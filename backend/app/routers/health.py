@@ -12,6 +12,13 @@ Web    : https://diegodebian.online
 """
 from fastapi import APIRouter
 
+from ..core.admission import controller
+from ..core.config import CLICK_SPOOL_ENABLED
+from ..database import read_engine, replica_usable, replica_status
+from ..services.click_spool import click_spool
+from ..services.code_filter import code_filter
+from ..services.resolution_cache import resolution_cache
+
 router = APIRouter()
 
 
@@ -19,3 +26,37 @@ router = APIRouter()
 async def health() -> dict:
     """Quick health check to verify the API is running."""
     return {"status": "ok"}
+
+
+@router.get("/api/health/admission", tags=["Health"])
+async def admission_metrics() -> dict:
+    """Admission control counters per route class (in flight, queued, shed)."""
+    return controller.snapshot()
+
+
+@router.get("/api/health/code-filter", tags=["Health"])
+async def code_filter_metrics() -> dict:
+    """Short-code Bloom filter state and number of requests it rejected."""
+    return code_filter.snapshot()
+
+
+@router.get("/api/health/replica", tags=["Health"])
+async def replica_health() -> dict:
+    """Read replica routing state (configured, usable, last measured lag)."""
+    if read_engine is None:
+        return {"configured": False}
+    await replica_usable()
+    return {
+        "configured": True,
+        "usable": replica_status["usable"],
+        "lag_seconds": replica_status["lag_seconds"],
+        "error": replica_status["error"],
+    }
+
+
+@router.get("/api/health/spool", tags=["Health"])
+async def spool_metrics() -> dict:
+    """Click spool backlog, fsync batching, replay progress and resolution cache."""
+    if not CLICK_SPOOL_ENABLED:
+        return {"enabled": False}
+    return {"enabled": True, **click_spool.snapshot(), "cache": resolution_cache.snapshot()}
@@ -18,20 +18,22 @@ from fastapi import Depends, Request
 from fastapi.responses import RedirectResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from ..database import get_session
+from ..sharding import get_code_session
 from ..services import redirect_service
 
 
 @router.get("/{short_code}", tags=["Redirect"])
 async def redirect_short_url(
-    short_code: str, request: Request, session: AsyncSession = Depends(get_session)
+    short_code: str, request: Request, session: AsyncSession = Depends(get_code_session)
 ):
     """Look up the short code and redirect to the original URL."""
     long_url = await redirect_service.get_redirect(
         session, 
         short_code, 
         request.headers.get("referer"), 
-        request.headers.get("user-agent")
+        request.headers.get("user-agent"),
+        # Nginx forwards the real client address in X-Real-IP
+        request.headers.get("x-real-ip") or (request.client.host if request.client else None),
     )
 
     return RedirectResponse(long_url, status_code=302)
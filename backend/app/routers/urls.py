@@ -14,30 +14,111 @@ from fastapi import APIRouter
 
 router = APIRouter()
 
-from fastapi import Depends
+from datetime import datetime
+from typing import AsyncGenerator, Optional
+
+from fastapi import Depends, HTTPException, Query, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from ..database import get_session
-from ..schemas import URLCreate, URLInfo, URLStats
-from ..services import url_service, stats_service
+from ..sharding import get_code_read_session, get_code_session, shard_for_code, shard_for_user, shards
+from ..schemas import URLCreate, URLInfo, URLStats, UserStats, UserStatsSort, Granularity, ExportFormat
+from ..services import url_service, stats_service, export_service
+from ..serialization import FastJSONResponse, url_info
+from ..core.config import FAST_JSON_RESPONSES
 from .auth import get_current_user
-from ..models import User
+from ..models import User, URL
+
+
+async def get_user_shard_session(
+    session: AsyncSession = Depends(get_session),
+    current_user: User = Depends(get_current_user),
+) -> AsyncGenerator[AsyncSession, None]:
+    """Session on the shard the current user's new URLs go to."""
+    index = shard_for_user(current_user.email)
+    if index == 0:
+        yield session
+        return
+    async with shards[index].session_factory() as shard_session:
+        yield shard_session
 
 
 @router.post("/api/urls", response_model=URLInfo, status_code=201, tags=["URLs"])
 async def create_url(
     url_in: URLCreate, 
-    session: AsyncSession = Depends(get_session),
+    response: Response,
+    session: AsyncSession = Depends(get_user_shard_session),
     current_user: User = Depends(get_current_user)
 ) -> URLInfo:
-    """Generate a short URL for the authenticated user."""
-    new_url = await url_service.create_url(session, url_in, current_user)
+    """Generate a short URL for the authenticated user (200 if an existing one is reused)."""
+    new_url, created = await url_service.create_or_reuse_url(session, url_in, current_user)
+    status_code = 201 if created else 200
+    if FAST_JSON_RESPONSES:
+        return FastJSONResponse(url_info(new_url), status_code=status_code)
+    response.status_code = status_code
     return URLInfo.model_validate(new_url)
 
 
 @router.get("/api/urls/{short_code}/stats", response_model=URLStats, tags=["Analytics"])
 async def url_stats(
-    short_code: str, session: AsyncSession = Depends(get_session)
+    short_code: str,
+    from_: Optional[datetime] = Query(None, alias="from", description="Range start (default: URL creation, capped by max points)"),
+    to: Optional[datetime] = Query(None, description="Range end (default: now)"),
+    granularity: Optional[Granularity] = Query(None, description="minute, hour, day or week (default: finest that fits)"),
+    session: AsyncSession = Depends(get_code_read_session),
 ) -> URLStats:
-    """Get click stats grouped by date for a short URL."""
-    return await stats_service.get_stats(session, short_code)
+    """Get click stats for a short URL, bucketed by minute/hour/day/week."""
+    if FAST_JSON_RESPONSES:
+        return FastJSONResponse(
+            await stats_service.get_stats_json(session, short_code, from_, to, granularity)
+        )
+    return await stats_service.get_stats(session, short_code, from_, to, granularity)
+
+
+@router.get("/api/me/stats", response_model=UserStats, tags=["Analytics"])
+async def my_stats(
+    from_: Optional[datetime] = Query(None, alias="from", description="Range start (default: account creation, capped by max points)"),
+    to: Optional[datetime] = Query(None, description="Range end (default: now)"),
+    granularity: Optional[Granularity] = Query(None, description="minute, hour, day or week (default: finest that fits)"),
+    sort: UserStatsSort = Query("range_clicks", description="Order URLs by range_clicks, total_clicks or created_at (descending)"),
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0),
+    current_user: User = Depends(get_current_user),
+) -> UserStats:
+    """Totals, per-URL click counts and a combined series for all of your URLs."""
+    if FAST_JSON_RESPONSES:
+        return FastJSONResponse(await stats_service.get_user_stats_json(
+            current_user, from_, to, granularity, sort, limit, offset
+        ))
+    return await stats_service.get_user_stats(
+        current_user, from_, to, granularity, sort, limit, offset
+    )
+
+
+@router.get("/api/urls/{short_code}/clicks/export", tags=["Analytics"])
+async def export_clicks(
+    short_code: str,
+    format: ExportFormat = Query("csv", description="csv or ndjson"),
+    from_: Optional[datetime] = Query(None, alias="from", description="Only clicks at or after this time"),
+    to: Optional[datetime] = Query(None, description="Only clicks before this time"),
+    gzip: bool = Query(False, description="Compress the export with gzip"),
+    session: AsyncSession = Depends(get_code_session),
+    current_user: User = Depends(get_current_user),
+) -> StreamingResponse:
+    """Stream raw click events for one of your short URLs as CSV or NDJSON."""
+    result = await session.execute(select(URL.user_email).where(URL.short_code == short_code))
+    owner = result.first()
+    if owner is None:
+        raise HTTPException(status_code=404, detail="Short URL not found")
+    if owner.user_email != current_user.email and current_user.plan != "admin":
+        raise HTTPException(status_code=403, detail="Not the owner of this short URL")
+
+    conditions = export_service.click_conditions(short_code=short_code, from_=from_, to=to)
+    filename = export_service.export_filename(short_code, format, gzip)
+    return StreamingResponse(
+        export_service.stream_clicks(conditions, format, gzip, [shard_for_code(short_code)]),
+        media_type="application/gzip" if gzip else export_service.MEDIA_TYPES[format],
+        headers=export_service.export_headers(filename),
+    )
@@ -12,8 +12,8 @@ Web    : https://diegodebian.online
 """
 
 from datetime import datetime, date
-from typing import Optional, List, Dict
-from pydantic import BaseModel, HttpUrl, Field, ConfigDict
+from typing import Optional, List, Dict, Literal
+from pydantic import BaseModel, HttpUrl, Field, ConfigDict, model_validator
 from fastapi.security import OAuth2PasswordRequestForm
 
 
@@ -23,6 +23,9 @@ class URLCreate(BaseModel):
     expires_at: Optional[datetime] = Field(
         None, description="Optional expiration date/time for the short URL"
     )
+    dedupe: Optional[bool] = Field(
+        None, description="Reuse your existing short URL for the same long_url (default: server setting)"
+    )
     
     # Forbid extra fields to prevent injection of unwanted data
     model_config = ConfigDict(extra='forbid')
@@ -39,15 +42,64 @@ class URLInfo(BaseModel):
     model_config = ConfigDict(from_attributes=True)
 
 
+Granularity = Literal["minute", "hour", "day", "week"]
+
+ExportFormat = Literal["csv", "ndjson"]
+
+
 class ClickAggregate(BaseModel):
     date: date
     clicks: int
 
 
+class ClickBucket(BaseModel):
+    bucket: datetime
+    clicks: int
+
+
 class URLStats(BaseModel):
     url: URLInfo
     total_clicks: int
+    # Daily buckets, only filled when granularity == "day" (kept for existing clients)
     by_date: List[ClickAggregate]
+    granularity: Granularity
+    from_: datetime = Field(..., alias="from")
+    to: datetime
+    # Approximate (HyperLogLog) unique visitors over the days overlapping the range
+    unique_visitors: int
+    series: List[ClickBucket]
+
+    model_config = ConfigDict(populate_by_name=True)
+
+
+UserStatsSort = Literal["range_clicks", "total_clicks", "created_at"]
+
+
+class UserURLClicks(BaseModel):
+    short_code: str
+    long_url: str
+    created_at: datetime
+    is_active: bool
+    total_clicks: int
+    range_clicks: int
+
+
+class UserStats(BaseModel):
+    """Dashboard totals for all of a user's URLs plus one page of per-URL counts."""
+    total_urls: int
+    active_urls: int
+    total_clicks: int
+    range_clicks: int
+    granularity: Granularity
+    from_: datetime = Field(..., alias="from")
+    to: datetime
+    # Clicks across all of the user's URLs
+    series: List[ClickBucket]
+    urls: List[UserURLClicks]
+    limit: int
+    offset: int
+
+    model_config = ConfigDict(populate_by_name=True)
 
 
 class UserBase(BaseModel):
@@ -111,4 +163,93 @@ class TopURLInfo(BaseModel):
     user_email: Optional[str]
     is_active: bool
     
-    model_config = ConfigDict(from_attributes=True)
\ No newline at end of file
+    model_config = ConfigDict(from_attributes=True)
+
+
+# ============================================================
+# Bulk Admin Schemas
+# ============================================================
+
+PLAN_PATTERN = r'^(free|premium|admin)$'
+
+
+class BulkPlanItem(BaseModel):
+    email: str
+    plan: str = Field(..., pattern=PLAN_PATTERN)
+
+    model_config = ConfigDict(extra='forbid')
+
+
+class BulkURLStatusItem(BaseModel):
+    short_code: str
+    is_active: bool
+
+    model_config = ConfigDict(extra='forbid')
+
+
+class UserFilter(BaseModel):
+    """Select users by email domain, current plan and/or registration range."""
+    email_domain: Optional[str] = None
+    plan: Optional[str] = Field(None, pattern=PLAN_PATTERN)
+    created_from: Optional[datetime] = None
+    created_to: Optional[datetime] = None
+
+    model_config = ConfigDict(extra='forbid')
+
+
+class URLFilter(BaseModel):
+    """Select URLs by owner, long URL domain and/or creation range."""
+    user_email: Optional[str] = None
+    domain: Optional[str] = None
+    created_from: Optional[datetime] = None
+    created_to: Optional[datetime] = None
+
+    model_config = ConfigDict(extra='forbid')
+
+
+def _check_bulk_target(items, filter_, value, value_name: str) -> None:
+    if (items is None) == (filter_ is None):
+        raise ValueError("Provide exactly one of 'items' or 'filter'")
+    if filter_ is not None:
+        if value is None:
+            raise ValueError(f"'{value_name}' is required with 'filter'")
+        if not filter_.model_dump(exclude_none=True):
+            raise ValueError("'filter' needs at least one criterion")
+
+
+class BulkPlanUpdate(BaseModel):
+    """Admin schema for bulk plan changes: explicit items or a filter + plan."""
+    items: Optional[List[BulkPlanItem]] = None
+    filter: Optional[UserFilter] = None
+    plan: Optional[str] = Field(None, pattern=PLAN_PATTERN)
+
+    model_config = ConfigDict(extra='forbid')
+
+    @model_validator(mode='after')
+    def check_target(self):
+        _check_bulk_target(self.items, self.filter, self.plan, "plan")
+        return self
+
+
+class BulkURLStatusUpdate(BaseModel):
+    """Admin schema for bulk URL status changes: explicit items or a filter + is_active."""
+    items: Optional[List[BulkURLStatusItem]] = None
+    filter: Optional[URLFilter] = None
+    is_active: Optional[bool] = None
+
+    model_config = ConfigDict(extra='forbid')
+
+    @model_validator(mode='after')
+    def check_target(self):
+        _check_bulk_target(self.items, self.filter, self.is_active, "is_active")
+        return self
+
+
+class BulkResult(BaseModel):
+    """Summary of a bulk admin operation."""
+    matched: int
+    updated: int
+    chunks: int
+    not_found: List[str]      # first 100 unknown keys (items mode only)
+    not_found_count: int
+    elapsed_ms: int
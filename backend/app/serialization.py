@@ -0,0 +1,145 @@
+"""
+        _~_
+       (o o)   diegodebian
+      /  V  \────────────────────────────────────
+     /(  _  )\  URL Shortener API (MVP)
+       ^^ ^^     FastAPI • PostgreSQL • Docker • Nginx
+
+File   : serialization.py
+Author : Diego Parra
+Web    : https://diegodebian.online
+─────────────────────────────────────────────────
+
+Fast JSON response path.
+
+Handlers normally return Pydantic models, which FastAPI validates a second
+time against `response_model` and then encodes with the stdlib json module.
+For payloads built straight from our own database rows that work is
+redundant, so when FAST_JSON_RESPONSES is enabled the handlers build plain
+dicts with the helpers below and return a FastJSONResponse directly.
+Returning a Response instance skips FastAPI's response_model pass entirely.
+
+The dict builders must produce exactly what the matching schema would
+serialize to (see schemas.py); they are only used for trusted rows.
+"""
+
+import json
+from functools import lru_cache
+from typing import Any, Iterable
+
+from fastapi.responses import Response
+from pydantic import HttpUrl, TypeAdapter
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is optional
+    orjson = None
+
+
+def _default(obj: Any) -> Any:
+    """Fallback encoder for the stdlib json path (dates, datetimes)."""
+    if hasattr(obj, "isoformat"):
+        return obj.isoformat()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dumps(content: Any) -> bytes:
+    """Encode content to JSON bytes, using orjson when it is installed."""
+    if orjson is not None:
+        return orjson.dumps(content)
+    return json.dumps(
+        content, default=_default, ensure_ascii=False, separators=(",", ":")
+    ).encode("utf-8")
+
+
+class FastJSONResponse(Response):
+    """JSON response that encodes with orjson and performs no validation."""
+
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+# ============================================================
+# Row -> dict builders (mirror the schemas in schemas.py)
+# ============================================================
+
+_HTTP_URL = TypeAdapter(HttpUrl)
+
+
+@lru_cache(maxsize=4096)
+def normalize_url(long_url: str) -> str:
+    """long_url as URLInfo.long_url (HttpUrl) serializes it: trailing slash, IDNA host, etc."""
+    return str(_HTTP_URL.validate_python(long_url))
+
+
+def url_info(url) -> dict:
+    """Same shape as schemas.URLInfo."""
+    return {
+        "id": url.id,
+        "short_code": url.short_code,
+        # URLs created through the API are stored normalized already; older or
+        # hand-inserted rows may not be
+        "long_url": normalize_url(url.long_url),
+        "created_at": url.created_at,
+        "expires_at": url.expires_at,
+        "is_active": url.is_active,
+    }
+
+
+def top_url_info(row) -> dict:
+    """Same shape as schemas.TopURLInfo."""
+    return {
+        "short_code": row.short_code,
+        "long_url": row.long_url,
+        "click_count": row.click_count or 0,
+        "user_email": row.user_email,
+        "is_active": row.is_active,
+    }
+
+
+def url_stats(url, total_clicks: int, window: dict, rows: Iterable) -> dict:
+    """Same shape as schemas.URLStats."""
+    rows = list(rows)
+    by_date = (
+        [{"date": row.bucket.date(), "clicks": row.clicks} for row in rows]
+        if window["granularity"] == "day" else []
+    )
+    return {
+        "url": url_info(url),
+        "total_clicks": total_clicks,
+        "by_date": by_date,
+        "granularity": window["granularity"],
+        "from": window["from"],
+        "to": window["to"],
+        "unique_visitors": window["unique_visitors"],
+        "series": [{"bucket": row.bucket, "clicks": row.clicks} for row in rows],
+    }
+
+
+def user_stats(totals, urls: Iterable, window: dict, rows: Iterable, limit: int, offset: int) -> dict:
+    """Same shape as schemas.UserStats."""
+    return {
+        "total_urls": totals.url_count,
+        "active_urls": totals.active_count,
+        "total_clicks": totals.clicks_total,
+        "range_clicks": totals.clicks_in_range,
+        "granularity": window["granularity"],
+        "from": window["from"],
+        "to": window["to"],
+        "series": [{"bucket": row.bucket, "clicks": row.clicks} for row in rows],
+        "urls": [
+            {
+                "short_code": row.short_code,
+                "long_url": row.long_url,
+                "created_at": row.created_at,
+                "is_active": row.is_active,
+                "total_clicks": row.total_clicks,
+                "range_clicks": row.range_clicks,
+            }
+            for row in urls
+        ],
+        "limit": limit,
+        "offset": offset,
+    }
@@ -0,0 +1,283 @@
+"""
+        _~_
+       (o o)   diegodebian
+      /  V  \────────────────────────────────────
+     /(  _  )\  URL Shortener API (MVP)
+       ^^ ^^     FastAPI • PostgreSQL • Docker • Nginx
+
+File   : bulk_service.py
+Author : Diego Parra
+Web    : https://diegodebian.online
+─────────────────────────────────────────────────
+
+Bulk admin operations (plan changes, URL enable/disable).
+
+Work is applied in chunks of BULK_CHUNK_SIZE rows, one set-based UPDATE and
+one short transaction per chunk, so mass moderation never holds long row
+locks:
+
+- items mode: an UPDATE .. FROM unnest(keys, values) join per chunk
+- filter mode: keyset-paginated UPDATE .. WHERE id IN (next chunk of ids)
+
+Each chunk reports its progress to an optional callback.
+
+URL status changes run on every shard that holds affected URLs (one shard
+after another, see app/sharding.py); their results are summed.
+"""
+import csv
+import io
+import json
+import logging
+import time
+from datetime import datetime
+from typing import Awaitable, Callable, List, Optional, Sequence
+
+from sqlalchemy import func, or_, select, text, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..core.config import BULK_CHUNK_SIZE
+from ..models import URL, User
+from ..schemas import BulkResult, URLFilter, UserFilter
+from ..sharding import NUM_SHARDS, shard_for_code, shards
+
+logger = logging.getLogger(__name__)
+
+# Called after each committed chunk with the keys it changed
+ChunkCallback = Callable[[List[str]], Awaitable[None]]
+
+NOT_FOUND_SAMPLE = 100
+
+
+# ============================================================
+# Input parsing (CSV / NDJSON bodies)
+# ============================================================
+
+def parse_rows(body: bytes, content_type: str) -> List[dict]:
+    """Parse a CSV (with header) or NDJSON body into a list of dicts."""
+    text_body = body.decode("utf-8-sig")
+    if "csv" in content_type:
+        return [
+            {key.strip(): value.strip() for key, value in row.items() if key}
+            for row in csv.DictReader(io.StringIO(text_body))
+        ]
+    return [json.loads(line) for line in text_body.splitlines() if line.strip()]
+
+
+def escape_like(value: str) -> str:
+    """Escape LIKE wildcards so user input only matches literally (use with escape='\\')."""
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def _chunks(items: Sequence, size: int):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _result(matched: int, updated: int, chunks: int, not_found: List[str], started: float) -> BulkResult:
+    return BulkResult(
+        matched=matched,
+        updated=updated,
+        chunks=chunks,
+        not_found=not_found[:NOT_FOUND_SAMPLE],
+        not_found_count=len(not_found),
+        elapsed_ms=int((time.monotonic() - started) * 1000),
+    )
+
+
+def _merge_results(results: List[BulkResult], started: float) -> BulkResult:
+    not_found = [key for result in results for key in result.not_found]
+    return BulkResult(
+        matched=sum(result.matched for result in results),
+        updated=sum(result.updated for result in results),
+        chunks=sum(result.chunks for result in results),
+        not_found=not_found[:NOT_FOUND_SAMPLE],
+        not_found_count=sum(result.not_found_count for result in results),
+        elapsed_ms=int((time.monotonic() - started) * 1000),
+    )
+
+
+async def _on_shard(session: AsyncSession, index: int, fn: Callable[[AsyncSession], Awaitable[BulkResult]]):
+    """Run fn on one shard; shard 0 reuses the request session."""
+    if index == 0:
+        return await fn(session)
+    async with shards[index].session_factory() as shard_session:
+        return await fn(shard_session)
+
+
+# ============================================================
+# Items mode: chunked UPDATE .. FROM unnest(...)
+# ============================================================
+
+_UPDATE_PLANS = text("""
+    UPDATE users SET plan = v.plan
+    FROM unnest(CAST(:emails AS VARCHAR[]), CAST(:plans AS VARCHAR[])) AS v(email, plan)
+    WHERE users.email = v.email AND users.plan IS DISTINCT FROM v.plan
+    RETURNING users.email
+""")
+
+_MATCH_USERS = text("SELECT email FROM users WHERE email = ANY(CAST(:emails AS VARCHAR[]))")
+
+_UPDATE_URL_STATUS = text("""
+    UPDATE urls SET is_active = v.is_active
+    FROM unnest(CAST(:codes AS VARCHAR[]), CAST(:flags AS BOOLEAN[])) AS v(short_code, is_active)
+    WHERE urls.short_code = v.short_code AND urls.is_active IS DISTINCT FROM v.is_active
+    RETURNING urls.short_code
+""")
+
+_MATCH_URLS = text("SELECT short_code FROM urls WHERE short_code = ANY(CAST(:codes AS VARCHAR[]))")
+
+
+async def _apply_items(
+    session: AsyncSession,
+    keys: List[str],
+    values: list,
+    update_stmt,
+    match_stmt,
+    key_param: str,
+    value_param: str,
+    on_chunk: Optional[ChunkCallback],
+) -> BulkResult:
+    started = time.monotonic()
+    matched = updated = chunks = 0
+    not_found: List[str] = []
+    for chunk in _chunks(list(zip(keys, values)), BULK_CHUNK_SIZE):
+        chunk_keys = [key for key, _ in chunk]
+        found = set((await session.execute(match_stmt, {key_param: chunk_keys})).scalars())
+        changed = list((await session.execute(
+            update_stmt, {key_param: chunk_keys, value_param: [value for _, value in chunk]}
+        )).scalars())
+        await session.commit()
+
+        chunks += 1
+        matched += len(found)
+        updated += len(changed)
+        not_found.extend(key for key in chunk_keys if key not in found)
+        logger.info("Bulk chunk %d: %d matched, %d updated", chunks, len(found), len(changed))
+        if on_chunk is not None:
+            await on_chunk(changed)
+    return _result(matched, updated, chunks, not_found, started)
+
+
+async def update_plans(
+    session: AsyncSession, emails: List[str], plans: List[str], on_chunk: Optional[ChunkCallback] = None
+) -> BulkResult:
+    return await _apply_items(
+        session, emails, plans, _UPDATE_PLANS, _MATCH_USERS, "emails", "plans", on_chunk
+    )
+
+
+async def update_url_status(
+    session: AsyncSession, codes: List[str], flags: List[bool], on_chunk: Optional[ChunkCallback] = None
+) -> BulkResult:
+    if NUM_SHARDS == 1:
+        return await _apply_items(
+            session, codes, flags, _UPDATE_URL_STATUS, _MATCH_URLS, "codes", "flags", on_chunk
+        )
+    started = time.monotonic()
+    by_shard: dict = {}
+    for code, flag in zip(codes, flags):
+        shard_codes, shard_flags = by_shard.setdefault(shard_for_code(code), ([], []))
+        shard_codes.append(code)
+        shard_flags.append(flag)
+    results = []
+    for index, (shard_codes, shard_flags) in sorted(by_shard.items()):
+        results.append(await _on_shard(session, index, lambda shard_session: _apply_items(
+            shard_session, shard_codes, shard_flags, _UPDATE_URL_STATUS, _MATCH_URLS, "codes", "flags", on_chunk
+        )))
+    return _merge_results(results, started)
+
+
+# ============================================================
+# Filter mode: keyset-paginated chunked UPDATE
+# ============================================================
+
+def _created_range(column, created_from: Optional[datetime], created_to: Optional[datetime]) -> list:
+    conditions = []
+    if created_from is not None:
+        conditions.append(column >= created_from)
+    if created_to is not None:
+        conditions.append(column < created_to)
+    return conditions
+
+
+def url_filter_conditions(url_filter: URLFilter) -> list:
+    conditions = _created_range(URL.created_at, url_filter.created_from, url_filter.created_to)
+    if url_filter.user_email:
+        conditions.append(URL.user_email == url_filter.user_email)
+    if url_filter.domain:
+        # Host part of the long URL, matching the domain itself or any subdomain
+        domain = url_filter.domain.lower().lstrip(".")
+        host = func.lower(func.substring(URL.long_url, r"^[A-Za-z][A-Za-z0-9+.-]*://([^/:?#]+)"))
+        conditions.append(or_(host == domain, host.like(f"%.{escape_like(domain)}", escape="\\")))
+    return conditions
+
+
+def user_filter_conditions(user_filter: UserFilter) -> list:
+    conditions = _created_range(User.created_at, user_filter.created_from, user_filter.created_to)
+    if user_filter.email_domain:
+        domain = escape_like(user_filter.email_domain.lstrip("@"))
+        conditions.append(User.email.ilike(f"%@{domain}", escape="\\"))
+    if user_filter.plan:
+        conditions.append(User.plan == user_filter.plan)
+    return conditions
+
+
+async def _apply_filter(
+    session: AsyncSession, model, key_column, conditions: list, values: dict, on_chunk: Optional[ChunkCallback]
+) -> BulkResult:
+    started = time.monotonic()
+    updated = chunks = 0
+    last_id = 0
+    # Rows that already have the target values are skipped, not re-written
+    unchanged = or_(*[
+        getattr(model, name).is_(None) | (getattr(model, name) != value)
+        for name, value in values.items()
+    ])
+    while True:
+        next_ids = (
+            select(model.id)
+            .where(*conditions, unchanged, model.id > last_id)
+            .order_by(model.id)
+            .limit(BULK_CHUNK_SIZE)
+            .scalar_subquery()
+        )
+        rows = (await session.execute(
+            update(model)
+            .where(model.id.in_(next_ids))
+            .values(**values)
+            .returning(model.id, key_column)
+            .execution_options(synchronize_session=False)
+        )).all()
+        await session.commit()
+        if not rows:
+            break
+
+        chunks += 1
+        updated += len(rows)
+        last_id = max(row[0] for row in rows)
+        logger.info("Bulk chunk %d: %d updated (up to id %d)", chunks, len(rows), last_id)
+        if on_chunk is not None:
+            await on_chunk([row[1] for row in rows])
+    return _result(updated, updated, chunks, [], started)
+
+
+async def update_plans_by_filter(
+    session: AsyncSession, user_filter: UserFilter, plan: str, on_chunk: Optional[ChunkCallback] = None
+) -> BulkResult:
+    return await _apply_filter(
+        session, User, User.email, user_filter_conditions(user_filter), {"plan": plan}, on_chunk
+    )
+
+
+async def update_url_status_by_filter(
+    session: AsyncSession, url_filter: URLFilter, is_active: bool, on_chunk: Optional[ChunkCallback] = None
+) -> BulkResult:
+    started = time.monotonic()
+    conditions = url_filter_conditions(url_filter)
+    results = [
+        await _on_shard(session, index, lambda shard_session: _apply_filter(
+            shard_session, URL, URL.short_code, conditions, {"is_active": is_active}, on_chunk
+        ))
+        for index in range(NUM_SHARDS)
+    ]
+    return results[0] if NUM_SHARDS == 1 else _merge_results(results, started)
@@ -0,0 +1,497 @@
+"""
+        _~_
+       (o o)   diegodebian
+      /  V  \────────────────────────────────────
+     /(  _  )\  URL Shortener API (MVP)
+       ^^ ^^     FastAPI • PostgreSQL • Docker • Nginx
+
+File   : click_spool.py
+Author : Diego Parra
+Web    : https://diegodebian.online
+─────────────────────────────────────────────────
+
+Durable local spool for click events.
+
+With CLICK_SPOOL_ENABLED a redirect no longer inserts the Click row and its
+rollups itself. It appends the event to a local append-only file and
+returns, and a background replayer loads the events into Postgres. During a
+database outage, codes in the resolution cache keep redirecting and their
+clicks are spooled until the database comes back.
+
+Layout and guarantees:
+
+- Each worker process locks its own slot directory (CLICK_SPOOL_DIR/slot-N)
+  and appends NDJSON lines to the newest segment file there. Segments are
+  sealed at CLICK_SPOOL_SEGMENT_BYTES, and by the replayer on every pass.
+- Writes use group commit: all events queued while an fsync is running go
+  to disk together in the next write + fsync. A redirect only returns once
+  its event has been fsynced.
+- Every event carries a random event_id, which is unique in `clicks`. The
+  replayer inserts with ON CONFLICT DO NOTHING, so replaying a segment twice
+  (after a crash) adds nothing. click_count and rollups are only updated for
+  rows that were actually inserted, in the same transaction.
+- Events also carry the shard of their URL (see app/sharding.py); a batch
+  is committed per shard, each in its own transaction.
+- Events marked counted=False were served from the cache while the counter
+  UPDATE failed. The replayer adds them to click_count.
+- A sealed segment is deleted only after all of its events are committed.
+  Segments left behind by a slot that no worker holds any more are adopted
+  by the next replay pass.
+- Once unreplayed data reaches CLICK_SPOOL_MAX_BYTES, new events are
+  refused. Healthy redirects then write to the database directly as before.
+- Events that can never load are quarantined instead of blocking replay.
+  That covers malformed events, a shard that is no longer configured, and
+  rows rejected by a constraint. They are appended to
+  CLICK_SPOOL_DIR/rejected/slot-N.ndjson with the error. Connection
+  failures and timeouts are not quarantined; the pass is retried with
+  backoff.
+"""
+
+import asyncio
+import fcntl
+import json
+import logging
+import os
+import time
+import uuid
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+from typing import List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.exc import DataError, IntegrityError
+
+from ..core.config import (
+    CLICK_SPOOL_DIR,
+    CLICK_SPOOL_FSYNC_MS,
+    CLICK_SPOOL_MAX_BYTES,
+    CLICK_SPOOL_REPLAY_BATCH,
+    CLICK_SPOOL_REPLAY_SECONDS,
+    CLICK_SPOOL_SEGMENT_BYTES,
+)
+from ..serialization import dumps
+from .rollup_service import record_rollups
+
+logger = logging.getLogger(__name__)
+
+SEGMENT_SUFFIX = ".seg"
+# Longest pause between replay attempts while the database keeps failing
+MAX_REPLAY_BACKOFF_SECONDS = 30.0
+# Failures caused by the events themselves; retrying them can never succeed
+POISON_ERRORS = (IntegrityError, DataError)
+
+_INSERT_CLICKS = text("""
+    INSERT INTO clicks (event_id, url_id, event_time, referrer, user_agent)
+    SELECT v.event_id, v.url_id, v.event_time, v.referrer, v.user_agent
+    FROM unnest(
+        CAST(:event_ids AS VARCHAR[]), CAST(:url_ids AS INTEGER[]), CAST(:event_times AS TIMESTAMP[]),
+        CAST(:referrers AS VARCHAR[]), CAST(:user_agents AS VARCHAR[])
+    ) AS v(event_id, url_id, event_time, referrer, user_agent)
+    JOIN urls ON urls.id = v.url_id
+    ON CONFLICT (event_id) DO NOTHING
+    RETURNING event_id
+""")
+
+_ADD_CLICK_COUNTS = text("""
+    UPDATE urls SET click_count = COALESCE(urls.click_count, 0) + v.clicks
+    FROM unnest(CAST(:url_ids AS INTEGER[]), CAST(:clicks AS INTEGER[])) AS v(url_id, clicks)
+    WHERE urls.id = v.url_id
+""")
+
+
+class SpoolFull(Exception):
+    """Unreplayed events have reached CLICK_SPOOL_MAX_BYTES."""
+
+
+def _fsync_dir(directory: Path) -> None:
+    fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def _segment_seq(path: Path) -> int:
+    return int(path.stem)
+
+
+class ClickSpool:
+    """Segmented append-only event log plus its replayer."""
+
+    def __init__(self, directory: str = CLICK_SPOOL_DIR):
+        self.root = Path(directory)
+        self.dir: Optional[Path] = None
+        self.slot: Optional[int] = None
+        self.ready = False
+        self._session_factories: list = []
+        self._lock_file = None
+        self._file = None
+        self._active: Optional[Path] = None
+        self._active_bytes = 0
+        self._sealed_bytes = 0
+        self._next_seq = 1
+        self._pending: list = []
+        self._wake: Optional[asyncio.Event] = None
+        self._io_lock: Optional[asyncio.Lock] = None
+        self._tasks: List[asyncio.Task] = []
+        # Counters for /api/health/spool
+        self.appended = 0
+        self.fsyncs = 0
+        self.rejected = 0
+        self.served_from_cache = 0
+        self.replayed = 0
+        self.skipped = 0
+        self.quarantined = 0
+        self.replay_errors = 0
+        self.last_error: Optional[str] = None
+        self.last_replay_at: Optional[datetime] = None
+        self.last_replay_rate = 0.0
+
+    # --------------------------------------------------------
+    # Files and slots
+    # --------------------------------------------------------
+
+    def _try_lock(self, directory: Path):
+        lock_file = open(directory / "lock", "a+b")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            lock_file.close()
+            return None
+        return lock_file
+
+    def _claim_slot(self) -> None:
+        """Lock the first slot directory no other process holds."""
+        self.root.mkdir(parents=True, exist_ok=True)
+        slot = 0
+        while True:
+            directory = self.root / f"slot-{slot}"
+            directory.mkdir(exist_ok=True)
+            lock_file = self._try_lock(directory)
+            if lock_file is not None:
+                self.dir, self.slot, self._lock_file = directory, slot, lock_file
+                return
+            slot += 1
+
+    def _segments(self, directory: Path) -> List[Path]:
+        return sorted(directory.glob(f"*{SEGMENT_SUFFIX}"), key=_segment_seq)
+
+    def _sealed_segments(self) -> List[Path]:
+        return [path for path in self._segments(self.dir) if path != self._active]
+
+    def _open_segment(self) -> None:
+        self._active = self.dir / f"{self._next_seq:012d}{SEGMENT_SUFFIX}"
+        self._next_seq += 1
+        self._file = open(self._active, "ab")
+        self._active_bytes = 0
+        _fsync_dir(self.dir)
+
+    def _rotate(self) -> None:
+        """Seal the active segment and start a new one (under the io lock)."""
+        self._file.close()
+        self._sealed_bytes += self._active_bytes
+        self._open_segment()
+
+    def _adopt_orphans(self) -> None:
+        """Move segments from slots no live process holds into our slot (under the io lock)."""
+        for directory in sorted(self.root.glob("slot-*")):
+            if directory == self.dir or not directory.is_dir():
+                continue
+            lock_file = self._try_lock(directory)
+            if lock_file is None:
+                continue
+            try:
+                for path in self._segments(directory):
+                    size = path.stat().st_size
+                    if size == 0:
+                        path.unlink()
+                        continue
+                    target = self.dir / f"{self._next_seq:012d}{SEGMENT_SUFFIX}"
+                    self._next_seq += 1
+                    os.replace(path, target)
+                    self._sealed_bytes += size
+                    logger.info("Click spool adopted %s from %s", path.name, directory.name)
+            finally:
+                lock_file.close()
+
+    # --------------------------------------------------------
+    # Writing
+    # --------------------------------------------------------
+
+    def _write(self, data: bytes) -> None:
+        self._file.write(data)
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._active_bytes += len(data)
+        if self._active_bytes >= CLICK_SPOOL_SEGMENT_BYTES:
+            self._rotate()
+
+    async def append(self, event: dict) -> None:
+        """Queue one event and wait until it is on disk."""
+        queued = sum(len(line) for line, _ in self._pending)
+        if self._sealed_bytes + self._active_bytes + queued >= CLICK_SPOOL_MAX_BYTES:
+            self.rejected += 1
+            raise SpoolFull()
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((dumps(event) + b"\n", future))
+        self._wake.set()
+        await future
+
+    async def record(
+        self,
+        url_id: int,
+        event_time: datetime,
+        referrer: Optional[str],
+        user_agent: Optional[str],
+        visitor: Optional[int],
+        counted: bool,
+        shard: int = 0,
+    ) -> bool:
+        """Spool a click. False if the spool is full or the write failed."""
+        event = {
+            "shard": shard,
+            "event_id": uuid.uuid4().hex,
+            "url_id": url_id,
+            "event_time": event_time.isoformat(),
+            "referrer": referrer,
+            "user_agent": user_agent,
+            "visitor": visitor,
+            "counted": counted,
+        }
+        try:
+            await self.append(event)
+        except SpoolFull:
+            return False
+        except OSError:
+            logger.exception("Click spool write failed")
+            return False
+        return True
+
+    async def _flush_loop(self) -> None:
+        while True:
+            await self._wake.wait()
+            if CLICK_SPOOL_FSYNC_MS:
+                await asyncio.sleep(CLICK_SPOOL_FSYNC_MS / 1000)
+            self._wake.clear()
+            batch, self._pending = self._pending, []
+            if not batch:
+                continue
+            try:
+                async with self._io_lock:
+                    await asyncio.to_thread(self._write, b"".join(line for line, _ in batch))
+            except Exception as exc:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(exc)
+                continue
+            self.fsyncs += 1
+            self.appended += len(batch)
+            for _, future in batch:
+                if not future.done():
+                    future.set_result(None)
+
+    # --------------------------------------------------------
+    # Replay
+    # --------------------------------------------------------
+
+    async def seal_active(self) -> None:
+        """Make everything written so far replayable."""
+        async with self._io_lock:
+            if self._active_bytes:
+                await asyncio.to_thread(self._rotate)
+
+    @staticmethod
+    def _read_segment(path: Path) -> List[dict]:
+        events = []
+        with open(path, "rb") as f:
+            for line_no, line in enumerate(f, start=1):
+                try:
+                    events.append(json.loads(line))
+                except ValueError:
+                    # Torn write at a crash; the request it belonged to never got its redirect
+                    logger.warning("Click spool %s: skipping unreadable line %d", path.name, line_no)
+        return events
+
+    def _check_event(self, event: dict) -> None:
+        """Raise ValueError if the event cannot be loaded as it is."""
+        if not isinstance(event, dict):
+            raise ValueError("not an object")
+        for key in ("event_id", "url_id", "event_time"):
+            if event.get(key) is None:
+                raise ValueError(f"missing {key}")
+        if not isinstance(event["url_id"], int):
+            raise ValueError("url_id is not an integer")
+        datetime.fromisoformat(event["event_time"])
+        # Events spooled before sharding carry no shard field
+        shard = event.get("shard", 0)
+        if not isinstance(shard, int) or not 0 <= shard < len(self._session_factories):
+            raise ValueError(f"shard {shard!r} is not configured")
+
+    def _quarantine(self, event, error: str) -> None:
+        """Append an unloadable event to this slot's reject file."""
+        directory = self.root / "rejected"
+        directory.mkdir(exist_ok=True)
+        line = dumps({"rejected_at": datetime.utcnow().isoformat(), "error": error, "event": event}) + b"\n"
+        with open(directory / f"slot-{self.slot}.ndjson", "ab") as f:
+            f.write(line)
+            f.flush()
+            os.fsync(f.fileno())
+        self.quarantined += 1
+        logger.warning("Click spool quarantined an event: %s", error)
+
+    async def _apply_batch(self, events: List[dict]) -> None:
+        valid = []
+        for event in events:
+            try:
+                self._check_event(event)
+            except (ValueError, TypeError) as exc:
+                await asyncio.to_thread(self._quarantine, event, f"{type(exc).__name__}: {exc}")
+                continue
+            valid.append(event)
+        events = list({event["event_id"]: event for event in valid}.values())
+        by_shard: dict = {}
+        for event in events:
+            by_shard.setdefault(event.get("shard", 0), []).append(event)
+        # One transaction per shard; a batch retried after a partial failure
+        # skips the shards already loaded thanks to ON CONFLICT (event_id)
+        for shard, shard_events in by_shard.items():
+            session_factory = self._session_factories[shard]
+            try:
+                await self._apply_shard_batch(session_factory, shard_events)
+            except POISON_ERRORS:
+                # Load the events one by one so only the offending ones are set aside
+                for event in shard_events:
+                    try:
+                        await self._apply_shard_batch(session_factory, [event])
+                    except POISON_ERRORS as exc:
+                        await asyncio.to_thread(
+                            self._quarantine, event, f"{type(exc).__name__}: {exc.orig or exc}"
+                        )
+
+    async def _apply_shard_batch(self, session_factory, events: List[dict]) -> None:
+        async with session_factory() as session:
+            inserted = set((await session.execute(_INSERT_CLICKS, {
+                "event_ids": [event["event_id"] for event in events],
+                "url_ids": [event["url_id"] for event in events],
+                "event_times": [datetime.fromisoformat(event["event_time"]) for event in events],
+                "referrers": [event["referrer"] for event in events],
+                "user_agents": [event["user_agent"] for event in events],
+            })).scalars())
+            fresh = [event for event in events if event["event_id"] in inserted]
+            uncounted = Counter(event["url_id"] for event in fresh if not event["counted"])
+            if uncounted:
+                await session.execute(
+                    _ADD_CLICK_COUNTS, {"url_ids": list(uncounted), "clicks": list(uncounted.values())}
+                )
+            await record_rollups(session, [
+                (event["url_id"], datetime.fromisoformat(event["event_time"]), event["visitor"])
+                for event in fresh
+            ])
+            await session.commit()
+        self.replayed += len(fresh)
+        # Already loaded by an earlier pass, or the URL was deleted meanwhile
+        self.skipped += len(events) - len(fresh)
+
+    async def replay_once(self) -> int:
+        """Load every sealed segment into the database, oldest first."""
+        await self.seal_active()
+        async with self._io_lock:
+            self._adopt_orphans()
+        started, total = time.monotonic(), 0
+        for path in self._sealed_segments():
+            size = path.stat().st_size
+            events = await asyncio.to_thread(self._read_segment, path)
+            for start in range(0, len(events), CLICK_SPOOL_REPLAY_BATCH):
+                await self._apply_batch(events[start:start + CLICK_SPOOL_REPLAY_BATCH])
+            path.unlink()
+            self._sealed_bytes = max(0, self._sealed_bytes - size)
+            total += len(events)
+        if total:
+            self.last_replay_rate = total / max(time.monotonic() - started, 1e-6)
+        self.last_replay_at = datetime.utcnow()
+        return total
+
+    async def _replay_loop(self) -> None:
+        failures = 0
+        while True:
+            await asyncio.sleep(min(CLICK_SPOOL_REPLAY_SECONDS * 2 ** failures, MAX_REPLAY_BACKOFF_SECONDS))
+            try:
+                await self.replay_once()
+                failures, self.last_error = 0, None
+            except Exception as exc:
+                failures = min(failures + 1, 10)
+                self.replay_errors += 1
+                self.last_error = type(exc).__name__
+                logger.warning("Click spool replay failed (%s); will retry", self.last_error)
+
+    # --------------------------------------------------------
+    # Lifecycle
+    # --------------------------------------------------------
+
+    async def start(self, session_factories: list) -> None:
+        """Claim a slot, open a fresh segment and start the writer and replayer.
+
+        session_factories holds one factory per shard, in shard order.
+        """
+        self._session_factories = session_factories
+        self._wake, self._io_lock = asyncio.Event(), asyncio.Lock()
+        self._claim_slot()
+        existing = self._segments(self.dir)
+        for path in existing:
+            if path.stat().st_size == 0:
+                path.unlink()
+        existing = self._segments(self.dir)
+        # Leftovers from this slot's previous process are sealed and replayed first
+        self._sealed_bytes = sum(path.stat().st_size for path in existing)
+        self._next_seq = max((_segment_seq(path) for path in existing), default=0) + 1
+        self._open_segment()
+        self._tasks = [
+            asyncio.create_task(self._flush_loop()),
+            asyncio.create_task(self._replay_loop()),
+        ]
+        self.ready = True
+        logger.info("Click spool ready in %s (%d pending segments)", self.dir, len(existing))
+
+    async def stop(self) -> None:
+        """Flush queued events to disk and release the slot. Replay resumes on next start."""
+        if not self.ready:
+            return
+        self.ready = False
+        flush_task, replay_task = self._tasks
+        replay_task.cancel()
+        for _ in range(500):
+            if not self._pending and not self._io_lock.locked():
+                break
+            await asyncio.sleep(0.01)
+        flush_task.cancel()
+        self._file.close()
+        if self._active_bytes == 0:
+            self._active.unlink()
+        self._lock_file.close()
+
+    def snapshot(self) -> dict:
+        """Counters for /api/health/spool."""
+        pending = self._sealed_segments() if self.ready else []
+        return {
+            "ready": self.ready,
+            "slot": self.slot,
+            "pending_segments": len(pending) + (1 if self._active_bytes else 0),
+            "pending_bytes": self._sealed_bytes + self._active_bytes,
+            "max_bytes": CLICK_SPOOL_MAX_BYTES,
+            "appended": self.appended,
+            "fsyncs": self.fsyncs,
+            "events_per_fsync": round(self.appended / self.fsyncs, 2) if self.fsyncs else 0,
+            "rejected": self.rejected,
+            "served_from_cache": self.served_from_cache,
+            "replayed": self.replayed,
+            "skipped": self.skipped,
+            "quarantined": self.quarantined,
+            "replay_errors": self.replay_errors,
+            "last_error": self.last_error,
+            "last_replay_at": self.last_replay_at,
+            "last_replay_rate": round(self.last_replay_rate, 1),
+        }
+
+
+click_spool = ClickSpool()
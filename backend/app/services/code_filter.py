@@ -0,0 +1,322 @@
+"""
+        _~_
+       (o o)   diegodebian
+      /  V  \────────────────────────────────────
+     /(  _  )\  URL Shortener API (MVP)
+       ^^ ^^     FastAPI • PostgreSQL • Docker • Nginx
+
+File   : code_filter.py
+Author : Diego Parra
+Web    : https://diegodebian.online
+─────────────────────────────────────────────────
+
+In-memory Bloom filter of issued short codes.
+
+Scanners hit /{short_code} with random strings and each one used to cost an
+UPDATE attempt plus a SELECT. The filter answers "definitely not issued"
+without touching the database:
+
+- Codes that are not canonical base62 are rejected outright.
+- Short codes encode the shard and the URL id on that shard (see
+  app/sharding.py), so a code whose id is far above the highest id we have
+  loaded from its shard (that shard's watermark) cannot exist yet.
+- Everything else is checked against the Bloom filter.
+
+Codes just above a watermark (within CODE_FILTER_HORIZON) always go to
+the database, so URLs created by another worker are never rejected before
+the periodic refresh picks them up.
+
+Ids are not committed in id order: while id N is still uncommitted, N+1 may
+already be visible. A watermark only moves past rows older than
+PENDING_ROW_GRACE, and each refresh rescans from the watermark, so a late
+commit is still picked up instead of falling below the watermark unseen.
+
+The filter is built from `urls` on every shard with a streaming read at
+startup, updated on creation and by a background refresh, and persisted to a
+snapshot file so a restart only has to read the rows added since the
+snapshot.
+"""
+
+import asyncio
+import hashlib
+import logging
+import math
+import os
+import struct
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import List, Optional
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from ..core.config import (
+    CODE_FILTER_CAPACITY,
+    CODE_FILTER_ERROR_RATE,
+    CODE_FILTER_HORIZON,
+    CODE_FILTER_REFRESH_SECONDS,
+    CODE_FILTER_SNAPSHOT,
+)
+from ..models import URL
+from ..sharding import NUM_SHARDS, split_number
+from ..utils import BASE62_ALPHABET, decode_base62
+
+logger = logging.getLogger(__name__)
+
+# Short codes are stored in a String(16) column
+MAX_CODE_LENGTH = 16
+
+# A row still without a short_code after this long was abandoned mid-creation.
+# Also how long a row may take to commit: watermarks stay behind newer rows.
+PENDING_ROW_GRACE = timedelta(minutes=1)
+
+_SNAPSHOT_MAGIC = b"DDBF"
+_SNAPSHOT_VERSION = 2
+# magic, version, capacity, bit count, hash count, item count, shard count;
+# followed by one watermark per shard, then the bits
+_SNAPSHOT_HEADER = struct.Struct("<4sHQQQQH")
+_SNAPSHOT_WATERMARK = struct.Struct("<q")
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter using double hashing over a blake2b digest."""
+
+    def __init__(self, capacity: int, error_rate: float):
+        self.capacity = max(1, capacity)
+        self.error_rate = error_rate
+        self.num_bits = max(8, int(-self.capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.num_hashes = max(1, round(self.num_bits / self.capacity * math.log(2)))
+        self.bits = bytearray((self.num_bits + 7) // 8)
+        self.count = 0
+
+    def _positions(self, key: str):
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        for i in range(self.num_hashes):
+            yield (h1 + i * h2) % self.num_bits
+
+    def add(self, key: str) -> None:
+        for pos in self._positions(key):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+    def __contains__(self, key: str) -> bool:
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(key))
+
+
+class CodeFilter:
+    """Bloom filter plus per-shard id watermarks, kept in sync with the urls tables."""
+
+    def __init__(self):
+        self.bloom: Optional[BloomFilter] = None
+        # every URL on shard i with id <= watermarks[i] is in the filter
+        self.watermarks: List[int] = [0] * NUM_SHARDS
+        self.ready = False
+        self.rejected = 0
+        self._task: Optional[asyncio.Task] = None
+        self._dirty = False
+
+    # --------------------------------------------------------
+    # Lookups
+    # --------------------------------------------------------
+
+    def might_exist(self, short_code: str) -> bool:
+        """False only if the code was definitely never issued."""
+        if not self.ready:
+            return True
+        exists = self._check(short_code)
+        if not exists:
+            self.rejected += 1
+        return exists
+
+    def _check(self, short_code: str) -> bool:
+        if len(short_code) > MAX_CODE_LENGTH:
+            return False
+        # encode_base62 never produces leading zeros
+        if len(short_code) > 1 and short_code[0] == BASE62_ALPHABET[0]:
+            return False
+        try:
+            shard, local_id = split_number(decode_base62(short_code))
+        except ValueError:
+            return False
+        if shard >= NUM_SHARDS:
+            return False
+        watermark = self.watermarks[shard]
+        if local_id > watermark:
+            return local_id <= watermark + CODE_FILTER_HORIZON
+        return short_code in self.bloom
+
+    def add(self, short_code: str) -> None:
+        """Record a newly issued code."""
+        if self.bloom is not None:
+            self.bloom.add(short_code)
+            self._dirty = True
+
+    # --------------------------------------------------------
+    # Building and refreshing
+    # --------------------------------------------------------
+
+    async def _scan(self, engine: AsyncEngine, bloom: BloomFilter, after_id: int) -> int:
+        """Stream URLs with id > after_id into bloom, return the new watermark."""
+        watermark = after_id
+        pending_id = None
+        settled_before = datetime.utcnow() - PENDING_ROW_GRACE
+        async with engine.connect() as conn:
+            result = await conn.stream(
+                select(URL.id, URL.short_code, URL.created_at)
+                .where(URL.id > after_id)
+                .order_by(URL.id)
+                .execution_options(yield_per=5000)
+            )
+            async for rows in result.partitions():
+                for url_id, short_code, created_at in rows:
+                    recent = created_at is not None and created_at > settled_before
+                    if short_code is None:
+                        # Row is mid-creation; don't move the watermark past it
+                        if pending_id is None and (created_at is None or recent):
+                            pending_id = url_id
+                        continue
+                    # Rows above the watermark are scanned again on every refresh
+                    if short_code not in bloom:
+                        bloom.add(short_code)
+                    if pending_id is None:
+                        if recent:
+                            # Lower ids may still be uncommitted; stop the watermark here
+                            pending_id = url_id
+                        else:
+                            watermark = url_id
+        return watermark
+
+    async def _snapshot_current(self, engines: List[AsyncEngine]) -> bool:
+        """False if a shard has fewer rows than the snapshot knows of (e.g. restored from backup)."""
+        for shard, engine in enumerate(engines):
+            async with engine.connect() as conn:
+                max_id = (await conn.execute(select(func.max(URL.id)))).scalar() or 0
+            if max_id < self.watermarks[shard]:
+                logger.warning(
+                    "Code filter snapshot is ahead of shard %d (watermark %d, max id %d); rebuilding",
+                    shard, self.watermarks[shard], max_id,
+                )
+                return False
+        return True
+
+    async def rebuild(self, engines: List[AsyncEngine], capacity: int = CODE_FILTER_CAPACITY) -> None:
+        """Full streaming build from the urls table of every shard."""
+        bloom = BloomFilter(capacity, CODE_FILTER_ERROR_RATE)
+        watermarks = [await self._scan(engine, bloom, 0) for engine in engines]
+        if bloom.count > bloom.capacity:
+            # Tables outgrew the configured capacity; size for twice the rows
+            bloom = BloomFilter(bloom.count * 2, CODE_FILTER_ERROR_RATE)
+            watermarks = [await self._scan(engine, bloom, 0) for engine in engines]
+        self.bloom, self.watermarks = bloom, watermarks
+        self._dirty = True
+        logger.info("Code filter built: %d codes, watermarks %s", bloom.count, watermarks)
+
+    async def refresh(self, engines: List[AsyncEngine]) -> None:
+        """Pick up URLs created since the watermarks (by any worker)."""
+        if self.bloom.count > self.bloom.capacity:
+            # Over capacity the false-positive rate climbs; grow and rebuild
+            await self.rebuild(engines, self.bloom.capacity * 2)
+            return
+        for shard, engine in enumerate(engines):
+            watermark = await self._scan(engine, self.bloom, self.watermarks[shard])
+            if watermark != self.watermarks[shard]:
+                self.watermarks[shard] = watermark
+                self._dirty = True
+
+    async def start(self, engines: List[AsyncEngine]) -> None:
+        """Load the snapshot (or build), then keep the filter fresh in the background."""
+        try:
+            if self.load_snapshot(CODE_FILTER_SNAPSHOT) and await self._snapshot_current(engines):
+                await self.refresh(engines)
+            else:
+                await self.rebuild(engines)
+            self.ready = True
+        except Exception:
+            logger.exception("Code filter build failed; redirects fall through to the database")
+        self._task = asyncio.create_task(self._refresh_loop(engines))
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+        if self.ready and self._dirty:
+            await asyncio.to_thread(self.save_snapshot, CODE_FILTER_SNAPSHOT)
+
+    async def _refresh_loop(self, engines: List[AsyncEngine]) -> None:
+        while True:
+            await asyncio.sleep(CODE_FILTER_REFRESH_SECONDS)
+            try:
+                if self.ready:
+                    await self.refresh(engines)
+                else:
+                    await self.rebuild(engines)
+                    self.ready = True
+                if self._dirty:
+                    await asyncio.to_thread(self.save_snapshot, CODE_FILTER_SNAPSHOT)
+            except Exception:
+                logger.exception("Code filter refresh failed")
+
+    # --------------------------------------------------------
+    # Snapshot persistence
+    # --------------------------------------------------------
+
+    def save_snapshot(self, path: str) -> None:
+        """Write the filter atomically (temp file + rename)."""
+        bloom = self.bloom
+        header = _SNAPSHOT_HEADER.pack(
+            _SNAPSHOT_MAGIC, _SNAPSHOT_VERSION, bloom.capacity,
+            bloom.num_bits, bloom.num_hashes, bloom.count, len(self.watermarks),
+        )
+        target = Path(path)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        tmp = target.with_suffix(target.suffix + ".tmp")
+        with open(tmp, "wb") as f:
+            f.write(header)
+            for watermark in self.watermarks:
+                f.write(_SNAPSHOT_WATERMARK.pack(watermark))
+            f.write(bloom.bits)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, target)
+        self._dirty = False
+
+    def load_snapshot(self, path: str) -> bool:
+        """Load a snapshot written by save_snapshot. Returns False if unusable."""
+        try:
+            with open(path, "rb") as f:
+                header = f.read(_SNAPSHOT_HEADER.size)
+                if len(header) != _SNAPSHOT_HEADER.size:
+                    return False
+                magic, version, capacity, num_bits, num_hashes, count, num_shards = _SNAPSHOT_HEADER.unpack(header)
+                if magic != _SNAPSHOT_MAGIC or version != _SNAPSHOT_VERSION or num_shards != NUM_SHARDS:
+                    # Older format or a different shard layout; rebuild instead
+                    return False
+                watermarks = [
+                    _SNAPSHOT_WATERMARK.unpack(f.read(_SNAPSHOT_WATERMARK.size))[0] for _ in range(num_shards)
+                ]
+                bits = f.read()
+        except (FileNotFoundError, struct.error):
+            return False
+        bloom = BloomFilter(capacity, CODE_FILTER_ERROR_RATE)
+        if bloom.num_bits != num_bits or bloom.num_hashes != num_hashes or len(bits) != len(bloom.bits):
+            # Written with different settings; rebuild instead
+            return False
+        bloom.bits = bytearray(bits)
+        bloom.count = count
+        self.bloom, self.watermarks = bloom, watermarks
+        logger.info("Code filter snapshot loaded: %d codes, watermarks %s", count, watermarks)
+        return True
+
+    def snapshot(self) -> dict:
+        """Counters for /api/health/code-filter."""
+        return {
+            "ready": self.ready,
+            "codes": self.bloom.count if self.bloom else 0,
+            "capacity": self.bloom.capacity if self.bloom else 0,
+            "watermarks": self.watermarks,
+            "rejected": self.rejected,
+        }
+
+
+code_filter = CodeFilter()
@@ -0,0 +1,124 @@
+"""
+        _~_
+       (o o)   diegodebian
+      /  V  \────────────────────────────────────
+     /(  _  )\  URL Shortener API (MVP)
+       ^^ ^^     FastAPI • PostgreSQL • Docker • Nginx
+
+File   : export_service.py
+Author : Diego Parra
+Web    : https://diegodebian.online
+─────────────────────────────────────────────────
+
+Streaming export of raw click events as CSV or NDJSON.
+
+Rows are read through a server-side cursor (AsyncSession.stream with
+yield_per), encoded one batch at a time and optionally gzipped on the fly,
+so memory stays at roughly one batch whatever the export size. The
+generator opens its own session: FastAPI closes dependency sessions before
+a StreamingResponse body is sent.
+
+With several shards the export reads them one after another (ordered by
+click id within each shard); a single-code export only reads its shard.
+"""
+import csv
+import io
+import re
+import zlib
+from datetime import datetime
+from typing import AsyncIterator, List, Optional
+
+from sqlalchemy import select
+
+from ..core.config import EXPORT_BATCH_SIZE
+from ..database import read_session_factory
+from ..models import URL, Click
+from ..serialization import dumps
+from ..sharding import shards
+from ..utils import to_naive_utc
+
+EXPORT_COLUMNS = ("id", "short_code", "event_time", "country", "referrer", "user_agent")
+
+MEDIA_TYPES = {"csv": "text/csv; charset=utf-8", "ndjson": "application/x-ndjson"}
+
+
+def click_conditions(
+    short_code: Optional[str] = None,
+    user_email: Optional[str] = None,
+    from_: Optional[datetime] = None,
+    to: Optional[datetime] = None,
+) -> list:
+    """WHERE clauses for an export; the query joins clicks to urls."""
+    conditions = []
+    if short_code is not None:
+        conditions.append(URL.short_code == short_code)
+    if user_email is not None:
+        conditions.append(URL.user_email == user_email)
+    if from_ is not None:
+        conditions.append(Click.event_time >= to_naive_utc(from_))
+    if to is not None:
+        conditions.append(Click.event_time < to_naive_utc(to))
+    return conditions
+
+
+def _encode_csv(rows, header: bool) -> bytes:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if header:
+        writer.writerow(EXPORT_COLUMNS)
+    for row in rows:
+        writer.writerow([
+            row.id, row.short_code, row.event_time.isoformat() if row.event_time else "",
+            row.country or "", row.referrer or "", row.user_agent or "",
+        ])
+    return buffer.getvalue().encode("utf-8")
+
+
+def _encode_ndjson(rows) -> bytes:
+    return b"".join(dumps(dict(zip(EXPORT_COLUMNS, row))) + b"\n" for row in rows)
+
+
+async def stream_clicks(
+    conditions: List, fmt: str, compress: bool, shard_indexes: Optional[List[int]] = None
+) -> AsyncIterator[bytes]:
+    """Yield the export body batch by batch (from every shard unless shard_indexes is given)."""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if compress else None  # 31 = gzip container
+    first = True
+    for index in range(len(shards)) if shard_indexes is None else shard_indexes:
+        # Shard 0 reads may go to the replica
+        session_factory = await read_session_factory() if index == 0 else shards[index].session_factory
+        async with session_factory() as session:
+            result = await session.stream(
+                select(Click.id, URL.short_code, Click.event_time, Click.country, Click.referrer, Click.user_agent)
+                .join(URL, URL.id == Click.url_id)
+                .where(*conditions)
+                .order_by(Click.id)
+                .execution_options(yield_per=EXPORT_BATCH_SIZE)
+            )
+            async for rows in result.partitions():
+                chunk = _encode_csv(rows, header=first) if fmt == "csv" else _encode_ndjson(rows)
+                first = False
+                if compressor is not None:
+                    chunk = compressor.compress(chunk)
+                if chunk:
+                    yield chunk
+    if fmt == "csv" and first:
+        # No rows: still emit the header so the file is valid
+        chunk = _encode_csv([], header=True)
+        yield compressor.compress(chunk) if compressor is not None else chunk
+    if compressor is not None:
+        yield compressor.flush()
+
+
+def export_filename(prefix: str, fmt: str, compress: bool) -> str:
+    # The prefix can come from a query parameter; keep the header value a plain token
+    prefix = re.sub(r"[^0-9A-Za-z]", "", prefix)[:32] or "export"
+    return f"{prefix}-clicks.{fmt}" + (".gz" if compress else "")
+
+
+def export_headers(filename: str) -> dict:
+    return {
+        "Content-Disposition": f'attachment; filename="{filename}"',
+        # Let Nginx pass batches straight through instead of spooling them to disk
+        "X-Accel-Buffering": "no",
+    }
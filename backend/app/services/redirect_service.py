@@ -10,28 +10,87 @@ Author : Diego Parra
 Web    : https://diegodebian.online
 ─────────────────────────────────────────────────
 """
+import asyncio
+import logging
 from datetime import datetime
 from fastapi import HTTPException
 from sqlalchemy import update, select
+from sqlalchemy.exc import DBAPIError, TimeoutError as PoolTimeoutError
 from sqlalchemy.ext.asyncio import AsyncSession
+from ..core.config import CLICK_SPOOL_DB_TIMEOUT_MS
 from ..models import URL, Click
+from ..sharding import shard_for_code
+from .click_spool import click_spool
+from .code_filter import code_filter
+from .resolution_cache import resolution_cache
+from .rollup_service import record_rollups
+from ..hll import visitor_hash
 
-async def get_redirect(session: AsyncSession, short_code: str, referrer: str | None, user_agent: str | None) -> str:
-    # Try to increment the click counter atomically while checking all conditions
-    stmt = (
+logger = logging.getLogger(__name__)
+
+# Failures that mean "database unreachable or too slow", not a bad request
+DB_UNAVAILABLE = (DBAPIError, PoolTimeoutError, OSError, asyncio.TimeoutError)
+
+
+def redirect_update(short_code: str, now: datetime):
+    """Atomic counter increment that only matches a usable URL."""
+    return (
         update(URL)
         .where(URL.short_code == short_code)
         .where(URL.is_active == True)
-        .where((URL.expires_at == None) | (URL.expires_at > datetime.utcnow()))
+        .where((URL.expires_at == None) | (URL.expires_at > now))
         .where(URL.click_count < URL.click_limit)
         .values(click_count=URL.click_count + 1)
-        .returning(URL.long_url, URL.id)
+        .returning(URL.long_url, URL.id, URL.expires_at, URL.click_limit, URL.click_count)
     )
-    
-    result = await session.execute(stmt)
+
+
+async def _count_click(session: AsyncSession, short_code: str, now: datetime):
+    """Run the counter UPDATE and commit. Returns the row, or None if not usable."""
+    stmt = redirect_update(short_code, now)
+    if click_spool.ready and CLICK_SPOOL_DB_TIMEOUT_MS and short_code in resolution_cache:
+        # A cached code can be served without the database, so don't wait long for it
+        result = await asyncio.wait_for(session.execute(stmt), CLICK_SPOOL_DB_TIMEOUT_MS / 1000)
+    else:
+        result = await session.execute(stmt)
     row = result.first()
-    
+    if row:
+        await session.commit()
+    return row
+
+
+async def get_redirect(
+    session: AsyncSession,
+    short_code: str,
+    referrer: str | None,
+    user_agent: str | None,
+    client_ip: str | None = None,
+) -> str:
+    # Reject codes that were never issued without touching the database
+    if not code_filter.might_exist(short_code):
+        raise HTTPException(status_code=404, detail="Short URL not found")
+
+    now = datetime.utcnow()
+    visitor = visitor_hash(client_ip, user_agent)
+
+    # Try to increment the click counter atomically while checking all conditions
+    try:
+        row = await _count_click(session, short_code, now)
+    except DB_UNAVAILABLE:
+        # take() also enforces the click allowance left at the last successful redirect
+        cached = resolution_cache.take(short_code, now) if click_spool.ready else None
+        if cached is None:
+            raise
+        # Serve the cached target; the replayer adds this click to click_count later
+        if not await click_spool.record(
+            cached.url_id, now, referrer, user_agent, visitor, counted=False, shard=shard_for_code(short_code)
+        ):
+            logger.warning("Click on %s served from cache but not recorded (spool unavailable)", short_code)
+        click_spool.served_from_cache += 1
+        return cached.long_url
+
     if not row:
+        resolution_cache.invalidate([short_code])
         # Figure out why the redirect failed and return a specific error
         q = await session.execute(select(URL).where(URL.short_code == short_code))
         url = q.scalar_one_or_none()
@@ -48,16 +107,26 @@ async def get_redirect(session: AsyncSession, short_code: str, referrer: str | N
         # Something unexpected happened
         raise HTTPException(status_code=404, detail="Short URL not found")
 
-    long_url, url_id = row
-    await session.commit()
+    # RETURNING sees click_count after the increment
+    long_url, url_id, expires_at, click_limit, click_count = row
+
+    if click_spool.ready:
+        resolution_cache.put(short_code, url_id, long_url, expires_at, click_limit - click_count)
+        # The replayer inserts the Click and its rollups
+        if await click_spool.record(
+            url_id, now, referrer, user_agent, visitor, counted=True, shard=shard_for_code(short_code)
+        ):
+            return long_url
 
-    # Save the analytics event for this click
+    # Save the analytics event for this click, plus its rollup buckets
     click = Click(
         url_id=url_id,
+        event_time=now,
         referrer=referrer,
         user_agent=user_agent,
     )
     session.add(click)
+    await record_rollups(session, [(url_id, now, visitor)])
     await session.commit()
     
     return long_url
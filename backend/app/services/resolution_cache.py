@@ -0,0 +1,107 @@
+"""
+        _~_
+       (o o)   diegodebian
+      /  V  \────────────────────────────────────
+     /(  _  )\  URL Shortener API (MVP)
+       ^^ ^^     FastAPI • PostgreSQL • Docker • Nginx
+
+File   : resolution_cache.py
+Author : Diego Parra
+Web    : https://diegodebian.online
+─────────────────────────────────────────────────
+
+In-process LRU of recently resolved short codes (TTL-bounded).
+
+Normal redirects still go through the counter UPDATE, which enforces the
+active flag, expiry and click limit. The cache is consulted only when the
+database fails or times out, so redirects for popular codes keep working
+through short outages. Admin status changes invalidate entries right away;
+changes made elsewhere are picked up within RESOLUTION_CACHE_TTL_SECONDS.
+
+Each entry also remembers how many clicks the URL had left at its last
+successful redirect and stops serving once this worker has used them up,
+so click limits hold during an outage. Each worker has its own cache, so
+a limit can still be exceeded by up to (workers - 1) times the allowance
+left at the start of the outage.
+"""
+
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Iterable, Optional
+
+from ..core.config import RESOLUTION_CACHE_SIZE, RESOLUTION_CACHE_TTL_SECONDS
+
+
+@dataclass
+class CachedURL:
+    url_id: int
+    long_url: str
+    expires_at: Optional[datetime]
+    cached_at: float
+    remaining: int      # clicks left before click_limit; decremented per cached serve
+
+
+class ResolutionCache:
+    """Bounded short_code -> CachedURL map with LRU eviction."""
+
+    def __init__(self, max_size: int = RESOLUTION_CACHE_SIZE, ttl: float = RESOLUTION_CACHE_TTL_SECONDS):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, CachedURL]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, short_code: str, now: Optional[datetime] = None) -> Optional[CachedURL]:
+        """Cached entry if still fresh and not past its expires_at."""
+        entry = self._entries.get(short_code)
+        if entry is None:
+            self.misses += 1
+            return None
+        expired = entry.expires_at is not None and entry.expires_at <= (now or datetime.utcnow())
+        if expired or entry.remaining <= 0 or time.monotonic() - entry.cached_at > self.ttl:
+            del self._entries[short_code]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(short_code)
+        self.hits += 1
+        return entry
+
+    def take(self, short_code: str, now: Optional[datetime] = None) -> Optional[CachedURL]:
+        """Like get, but uses up one of the entry's remaining clicks."""
+        entry = self.get(short_code, now)
+        if entry is not None:
+            entry.remaining -= 1
+        return entry
+
+    def __contains__(self, short_code: str) -> bool:
+        return short_code in self._entries
+
+    def put(
+        self, short_code: str, url_id: int, long_url: str, expires_at: Optional[datetime], remaining: int
+    ) -> None:
+        if self.max_size <= 0:
+            return
+        self._entries[short_code] = CachedURL(url_id, long_url, expires_at, time.monotonic(), remaining)
+        self._entries.move_to_end(short_code)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, short_codes: Iterable[str]) -> None:
+        for short_code in short_codes:
+            self._entries.pop(short_code, None)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def snapshot(self) -> dict:
+        return {"size": len(self._entries), "max_size": self.max_size, "hits": self.hits, "misses": self.misses}
+
+
+resolution_cache = ResolutionCache()
+
+
+async def invalidate_codes(short_codes: Iterable[str]) -> None:
+    """bulk_service chunk callback: drop codes whose status just changed."""
+    resolution_cache.invalidate(short_codes)
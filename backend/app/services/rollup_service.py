@@ -0,0 +1,100 @@
+"""
+        _~_
+       (o o)   diegodebian
+      /  V  \────────────────────────────────────
+     /(  _  )\  URL Shortener API (MVP)
+       ^^ ^^     FastAPI • PostgreSQL • Docker • Nginx
+
+File   : rollup_service.py
+Author : Diego Parra
+Web    : https://diegodebian.online
+─────────────────────────────────────────────────
+
+Click rollups: per-URL click counts at minute, hour and day resolution,
+maintained in the click ingestion path so stats never scan `clicks`.
+Week buckets are derived from the day rollups at query time.
+
+Day rollups also carry a HyperLogLog sketch of visitors (see hll.py); each
+click sets one register in place, in the same statement as the counters.
+"""
+from datetime import datetime, timedelta
+from typing import Iterable, Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .. import hll
+
+# Stored resolutions
+RESOLUTIONS = ("minute", "hour", "day")
+
+# Queryable granularities and their bucket width
+GRANULARITY_STEPS = {
+    "minute": timedelta(minutes=1),
+    "hour": timedelta(hours=1),
+    "day": timedelta(days=1),
+    "week": timedelta(weeks=1),
+}
+
+# Which stored rollup each granularity is read from
+GRANULARITY_SOURCE = {"minute": "minute", "hour": "hour", "day": "day", "week": "day"}
+
+
+def bucket_start(event_time: datetime, granularity: str) -> datetime:
+    """Truncate a timestamp to the start of its bucket (weeks start on Monday)."""
+    if granularity == "minute":
+        return event_time.replace(second=0, microsecond=0)
+    if granularity == "hour":
+        return event_time.replace(minute=0, second=0, microsecond=0)
+    day = event_time.replace(hour=0, minute=0, second=0, microsecond=0)
+    if granularity == "week":
+        return day - timedelta(days=day.weekday())
+    return day
+
+
+# One click into all three resolutions. visitors is only set on the day row;
+# on conflict the click's register is raised in place with set_byte/get_byte.
+_ROLLUP_UPSERT = text(f"""
+    INSERT INTO click_rollups (url_id, resolution, bucket, clicks, visitors)
+    VALUES
+        (:url_id, 'minute', :minute, 1, NULL),
+        (:url_id, 'hour', :hour, 1, NULL),
+        (:url_id, 'day', :day, 1, CASE
+            WHEN CAST(:hll_index AS INTEGER) IS NULL THEN NULL
+            ELSE set_byte(decode(repeat('00', {hll.NUM_REGISTERS}), 'hex'),
+                          CAST(:hll_index AS INTEGER), CAST(:hll_rank AS INTEGER))
+        END)
+    ON CONFLICT (url_id, resolution, bucket) DO UPDATE SET
+        clicks = click_rollups.clicks + EXCLUDED.clicks,
+        visitors = CASE
+            WHEN EXCLUDED.visitors IS NULL THEN click_rollups.visitors
+            WHEN click_rollups.visitors IS NULL THEN EXCLUDED.visitors
+            ELSE set_byte(
+                click_rollups.visitors,
+                CAST(:hll_index AS INTEGER),
+                GREATEST(get_byte(click_rollups.visitors, CAST(:hll_index AS INTEGER)),
+                         CAST(:hll_rank AS INTEGER))
+            )
+        END
+""")
+
+
+def _rollup_params(url_id: int, event_time: datetime, visitor: Optional[int]) -> dict:
+    hll_index, hll_rank = hll.register_update(visitor) if visitor is not None else (None, None)
+    return {
+        "url_id": url_id,
+        "minute": bucket_start(event_time, "minute"),
+        "hour": bucket_start(event_time, "hour"),
+        "day": bucket_start(event_time, "day"),
+        "hll_index": hll_index,
+        "hll_rank": hll_rank,
+    }
+
+
+async def record_rollups(
+    session: AsyncSession, events: Iterable[Tuple[int, datetime, Optional[int]]]
+) -> None:
+    """Add (url_id, event_time, visitor_hash) clicks to the rollups (not committed)."""
+    params = [_rollup_params(*event) for event in events]
+    if params:
+        await session.execute(_ROLLUP_UPSERT, params if len(params) > 1 else params[0])
@@ -10,13 +10,87 @@ Author : Diego Parra
 Web    : https://diegodebian.online
 ─────────────────────────────────────────────────
 """
+import math
+from datetime import datetime
+from types import SimpleNamespace
+from typing import Optional
+
 from fastapi import HTTPException
-from sqlalchemy import select, func, cast, Date as SQLDate
+from sqlalchemy import BigInteger, cast, select, func, true
+from sqlalchemy.dialects.postgresql import aggregate_order_by
 from sqlalchemy.ext.asyncio import AsyncSession
-from ..models import URL, Click
-from ..schemas import URLStats, URLInfo, ClickAggregate
+from ..core.config import STATS_MAX_POINTS
+from ..models import URL, ClickRollup, User
+from ..schemas import URLStats, URLInfo, ClickAggregate, ClickBucket, UserStats, UserURLClicks
+from ..sharding import NUM_SHARDS, scatter
+from .. import serialization, hll
+from ..utils import to_naive_utc
+from .rollup_service import GRANULARITY_STEPS, GRANULARITY_SOURCE, bucket_start
+
+
+def _points(start: datetime, end: datetime, granularity: str) -> int:
+    step = GRANULARITY_STEPS[granularity]
+    return math.floor((end - bucket_start(start, granularity)) / step) + 1
+
+
+def plan_window(
+    created_at: datetime,
+    from_: Optional[datetime],
+    to: Optional[datetime],
+    granularity: Optional[str],
+):
+    """
+    Resolve the time range and granularity for a stats query so the response
+    never exceeds STATS_MAX_POINTS buckets.
+
+    - No parameters: daily buckets for the most recent STATS_MAX_POINTS days.
+    - No granularity: the finest granularity that fits the range.
+    - Granularity too fine for the range: coarsened until it fits.
+    - Even weekly too fine: the range start is moved forward.
+    """
+    from_, to = to_naive_utc(from_), to_naive_utc(to)
+    to = to or datetime.utcnow()
+    if from_ is None and granularity is None:
+        granularity = "day"
+    if from_ is None:
+        earliest = to - GRANULARITY_STEPS[granularity] * (STATS_MAX_POINTS - 1)
+        from_ = max(created_at or earliest, earliest)
+    if from_ >= to:
+        raise HTTPException(status_code=422, detail="'from' must be before 'to'")
+
+    candidates = list(GRANULARITY_STEPS)
+    if granularity is not None:
+        candidates = candidates[candidates.index(granularity):]
+    for candidate in candidates:
+        if _points(from_, to, candidate) <= STATS_MAX_POINTS:
+            return from_, to, candidate
+
+    from_ = to - GRANULARITY_STEPS["week"] * (STATS_MAX_POINTS - 1)
+    return from_, to, "week"
+
+
+def _rollup_bucket(granularity: str):
+    """Bucket expression over the coarsest stored rollup that can represent the granularity."""
+    if GRANULARITY_SOURCE[granularity] == granularity:
+        return ClickRollup.bucket
+    return func.date_trunc(granularity, ClickRollup.bucket)
+
+
+def _rollup_range(from_: datetime, to: datetime, granularity: str) -> list:
+    return [
+        ClickRollup.resolution == GRANULARITY_SOURCE[granularity],
+        ClickRollup.bucket >= bucket_start(from_, granularity),
+        ClickRollup.bucket <= to,
+    ]
 
-async def get_stats(session: AsyncSession, short_code: str) -> URLStats:
+
+async def _fetch_stats(
+    session: AsyncSession,
+    short_code: str,
+    from_: Optional[datetime],
+    to: Optional[datetime],
+    granularity: Optional[str],
+):
     # Look up the URL first
     result = await session.execute(
         select(URL).where(URL.short_code == short_code)
@@ -25,19 +99,250 @@ async def get_stats(session: AsyncSession, short_code: str) -> URLStats:
     if url is None:
         raise HTTPException(status_code=404, detail="Short URL not found")
 
-    # We already have the count cached on the URL row
-    total_clicks = url.click_count
+    from_, to, granularity = plan_window(url.created_at, from_, to, granularity)
 
-    # Aggregate clicks by day
+    bucket = _rollup_bucket(granularity)
     group_result = await session.execute(
+        select(bucket.label("bucket"), func.sum(ClickRollup.clicks).label("clicks"))
+        .where(ClickRollup.url_id == url.id, *_rollup_range(from_, to, granularity))
+        .group_by(bucket)
+        .order_by(bucket)
+    )
+
+    # Unique visitors: merge the daily HyperLogLog sketches overlapping the range
+    sketch_result = await session.execute(
+        select(ClickRollup.visitors).where(
+            ClickRollup.url_id == url.id,
+            ClickRollup.resolution == "day",
+            ClickRollup.bucket >= bucket_start(from_, "day"),
+            ClickRollup.bucket <= to,
+            ClickRollup.visitors.is_not(None),
+        )
+    )
+    unique_visitors = hll.estimate(hll.merge(sketch_result.scalars()))
+
+    window = {
+        "granularity": granularity,
+        "from": from_,
+        "to": to,
+        "unique_visitors": unique_visitors,
+    }
+    # We already have the lifetime count cached on the URL row
+    return url, url.click_count, window, group_result.all()
+
+
+async def get_stats(
+    session: AsyncSession,
+    short_code: str,
+    from_: Optional[datetime] = None,
+    to: Optional[datetime] = None,
+    granularity: Optional[str] = None,
+) -> URLStats:
+    url, total_clicks, window, rows = await _fetch_stats(session, short_code, from_, to, granularity)
+    series = [ClickBucket(bucket=row.bucket, clicks=row.clicks) for row in rows]
+    by_date = (
+        [ClickAggregate(date=row.bucket.date(), clicks=row.clicks) for row in rows]
+        if window["granularity"] == "day" else []
+    )
+
+    return URLStats(
+        url=URLInfo.model_validate(url),
+        total_clicks=total_clicks,
+        by_date=by_date,
+        granularity=window["granularity"],
+        from_=window["from"],
+        to=window["to"],
+        unique_visitors=window["unique_visitors"],
+        series=series,
+    )
+
+
+async def get_stats_json(
+    session: AsyncSession,
+    short_code: str,
+    from_: Optional[datetime] = None,
+    to: Optional[datetime] = None,
+    granularity: Optional[str] = None,
+) -> dict:
+    """Same payload as get_stats, built as a plain dict for the fast JSON path."""
+    url, total_clicks, window, rows = await _fetch_stats(session, short_code, from_, to, granularity)
+    return serialization.url_stats(url, total_clicks, window, rows)
+
+
+# ============================================================
+# Per-user dashboard stats
+# ============================================================
+
+async def _fetch_user_stats(
+    session: AsyncSession,
+    user: User,
+    window: dict,
+    sort: str,
+    limit: int,
+    offset: int,
+):
+    """
+    Totals, one page of per-URL counts and the combined series in a single
+    query, however many URLs the user has.
+    """
+    from_, to, granularity = window["from"], window["to"], window["granularity"]
+    # Rows without a short code were abandoned mid-creation and never usable
+    owned = [URL.user_email == user.email, URL.short_code.is_not(None)]
+    user_urls = select(URL.id).where(*owned)
+
+    # Clicks per URL in the range, from the rollups
+    range_clicks = (
+        select(ClickRollup.url_id, func.sum(ClickRollup.clicks).label("clicks"))
+        .where(ClickRollup.url_id.in_(user_urls), *_rollup_range(from_, to, granularity))
+        .group_by(ClickRollup.url_id)
+        .cte("range_clicks")
+    )
+    per_url = (
         select(
-            cast(Click.event_time, SQLDate).label("date"),
-            func.count(Click.id).label("clicks"),
+            URL.id,
+            URL.short_code,
+            URL.long_url,
+            URL.created_at,
+            URL.is_active,
+            func.coalesce(URL.click_count, 0).label("total_clicks"),
+            func.coalesce(range_clicks.c.clicks, 0).label("range_clicks"),
         )
-        .where(Click.url_id == url.id)
-        .group_by(cast(Click.event_time, SQLDate))
-        .order_by(cast(Click.event_time, SQLDate))
+        .outerjoin(range_clicks, range_clicks.c.url_id == URL.id)
+        .where(*owned)
+        .cte("per_url")
+    )
+    # Combined series, returned as two arrays ordered by bucket
+    bucket = _rollup_bucket(granularity)
+    series = (
+        select(bucket.label("bucket"), func.sum(ClickRollup.clicks).label("clicks"))
+        .where(ClickRollup.url_id.in_(user_urls), *_rollup_range(from_, to, granularity))
+        .group_by(bucket)
+        .cte("series")
+    )
+    # Labels differ from the per-URL columns, both end up in the same row
+    totals = select(
+        func.count().label("url_count"),
+        func.count().filter(per_url.c.is_active.is_(True)).label("active_count"),
+        func.coalesce(func.sum(per_url.c.total_clicks), 0).label("clicks_total"),
+        # sum() of a bigint is numeric in Postgres; keep it an integer
+        cast(func.coalesce(func.sum(per_url.c.range_clicks), 0), BigInteger).label("clicks_in_range"),
+        select(func.array_agg(aggregate_order_by(series.c.bucket, series.c.bucket)))
+        .scalar_subquery().label("series_buckets"),
+        select(func.array_agg(aggregate_order_by(series.c.clicks, series.c.bucket)))
+        .scalar_subquery().label("series_clicks"),
+    ).cte("totals")
+    sort_column = per_url.c[sort]
+    page = (
+        select(per_url)
+        .order_by(sort_column.desc(), per_url.c.id.desc())
+        .limit(limit)
+        .offset(offset)
+        .subquery("page")
     )
-    by_date = [ClickAggregate(date=row.date, clicks=row.clicks) for row in group_result]
+    # LEFT JOIN so the totals come back even when the page is empty
+    result = await session.execute(
+        select(totals, page)
+        .select_from(totals.outerjoin(page, true()))
+        .order_by(page.c[sort].desc(), page.c.id.desc())
+    )
+    rows = result.all()
+    urls = [row for row in rows if row.id is not None]
+    totals = rows[0]
+    series_rows = [
+        SimpleNamespace(bucket=bucket_value, clicks=clicks)
+        for bucket_value, clicks in zip(totals.series_buckets or [], totals.series_clicks or [])
+    ]
+    return totals, urls, series_rows
+
 
-    return URLStats(url=URLInfo.model_validate(url), total_clicks=total_clicks, by_date=by_date)
+async def _gather_user_stats(
+    user: User,
+    from_: Optional[datetime],
+    to: Optional[datetime],
+    granularity: Optional[str],
+    sort: str,
+    limit: int,
+    offset: int,
+):
+    """
+    Run _fetch_user_stats on every shard and merge: totals and series are
+    summed, and the page is cut from the first offset + limit URLs of each
+    shard. With one shard the query result is returned as is.
+    """
+    from_, to, granularity = plan_window(user.created_at, from_, to, granularity)
+    window = {"granularity": granularity, "from": from_, "to": to}
+    if NUM_SHARDS == 1:
+        results = await scatter(
+            lambda session, shard: _fetch_user_stats(session, user, window, sort, limit, offset), read=True
+        )
+        totals, urls, rows = results[0]
+        return totals, urls, window, rows
+
+    results = await scatter(
+        lambda session, shard: _fetch_user_stats(session, user, window, sort, offset + limit, 0), read=True
+    )
+    totals = SimpleNamespace(**{
+        name: sum(getattr(shard_totals, name) for shard_totals, _, _ in results)
+        for name in ("url_count", "active_count", "clicks_total", "clicks_in_range")
+    })
+    # Same order as each shard's ORDER BY (sort desc, id desc), then shard,
+    # so every shard's first offset + limit rows are a prefix of the merge
+    ranked = sorted(
+        (
+            (getattr(row, sort), row.id, shard, row)
+            for shard, (_, shard_urls, _) in enumerate(results)
+            for row in shard_urls
+        ),
+        key=lambda item: item[:3],
+        reverse=True,
+    )
+    urls = [row for _, _, _, row in ranked[offset:offset + limit]]
+    series: dict = {}
+    for _, _, shard_rows in results:
+        for row in shard_rows:
+            series[row.bucket] = series.get(row.bucket, 0) + row.clicks
+    rows = [SimpleNamespace(bucket=bucket, clicks=clicks) for bucket, clicks in sorted(series.items())]
+    return totals, urls, window, rows
+
+
+async def get_user_stats(
+    user: User,
+    from_: Optional[datetime] = None,
+    to: Optional[datetime] = None,
+    granularity: Optional[str] = None,
+    sort: str = "range_clicks",
+    limit: int = 20,
+    offset: int = 0,
+) -> UserStats:
+    totals, urls, window, rows = await _gather_user_stats(
+        user, from_, to, granularity, sort, limit, offset
+    )
+    return UserStats(
+        total_urls=totals.url_count,
+        active_urls=totals.active_count,
+        total_clicks=totals.clicks_total,
+        range_clicks=totals.clicks_in_range,
+        granularity=window["granularity"],
+        from_=window["from"],
+        to=window["to"],
+        series=[ClickBucket(bucket=row.bucket, clicks=row.clicks) for row in rows],
+        urls=[UserURLClicks.model_validate(row, from_attributes=True) for row in urls],
+        limit=limit,
+        offset=offset,
+    )
+
+
+async def get_user_stats_json(
+    user: User,
+    from_: Optional[datetime] = None,
+    to: Optional[datetime] = None,
+    granularity: Optional[str] = None,
+    sort: str = "range_clicks",
+    limit: int = 20,
+    offset: int = 0,
+) -> dict:
+    """Same payload as get_user_stats, built as a plain dict for the fast JSON path."""
+    totals, urls, window, rows = await _gather_user_stats(
+        user, from_, to, granularity, sort, limit, offset
+    )
+    return serialization.user_stats(totals, urls, window, rows, limit, offset)
@@ -10,20 +10,96 @@ Author : Diego Parra
 Web    : https://diegodebian.online
 ─────────────────────────────────────────────────
 """
+import hashlib
+from datetime import datetime
+from typing import Optional, Tuple
+
 from sqlalchemy.ext.asyncio import AsyncSession
+from ..core.config import URL_DEDUP
 from ..models import URL, User
 from ..schemas import URLCreate
-from ..utils import encode_base62
+from ..sharding import NUM_SHARDS, encode_code, scatter, shard_for_user
+from ..utils import long_url_hash
+from .code_filter import code_filter
 
 from fastapi import HTTPException
 from sqlalchemy import select, func
 
-async def create_url(session: AsyncSession, url_in: URLCreate, user: User) -> URL:
-    # Check plan-based URL limits
+
+async def find_existing_url(session: AsyncSession, url_in: URLCreate, user: User) -> Optional[URL]:
+    """
+    Find a still-usable short URL this user already created for the same
+    long_url and expiry. One lookup on the (user_email, long_url_hash) index;
+    long_url is compared as well to rule out hash collisions.
+
+    Runs on the user's shard only: URLs created before the shard count
+    changed are not reused, a new code is issued instead.
+    """
+    long_url = str(url_in.long_url)
     result = await session.execute(
-        select(func.count(URL.id)).where(URL.user_email == user.email, URL.is_active == True)
+        select(URL)
+        .where(
+            URL.user_email == user.email,
+            URL.long_url_hash == long_url_hash(long_url),
+            URL.long_url == long_url,
+            URL.expires_at == url_in.expires_at,
+            URL.short_code.is_not(None),
+            URL.is_active == True,
+            (URL.expires_at == None) | (URL.expires_at > datetime.utcnow()),
+            URL.click_count < URL.click_limit,
+        )
+        .order_by(URL.id.desc())
+        .limit(1)
     )
-    count = result.scalar() or 0
+    return result.scalar_one_or_none()
+
+
+def _dedupe_lock_key(user: User, long_url: str) -> int:
+    """Advisory lock key (signed 64-bit) for one user's submissions of one long_url."""
+    digest = hashlib.blake2b(f"{user.email}\0{long_url}".encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "big", signed=True)
+
+
+async def create_or_reuse_url(session: AsyncSession, url_in: URLCreate, user: User) -> Tuple[URL, bool]:
+    """
+    Return (url, created). With dedup on, repeat submissions reuse the existing code.
+
+    A transaction-scoped advisory lock per (user, long_url) is held from the
+    lookup until the new row commits, so two identical submissions at the
+    same time can't both miss the lookup and insert twice. A unique index
+    doesn't fit: with dedupe off (or a different expiry) duplicates are
+    allowed.
+    """
+    dedupe = URL_DEDUP if url_in.dedupe is None else url_in.dedupe
+    if dedupe:
+        await session.execute(
+            select(func.pg_advisory_xact_lock(_dedupe_lock_key(user, str(url_in.long_url))))
+        )
+        existing = await find_existing_url(session, url_in, user)
+        if existing is not None:
+            # Ends the transaction, releasing the lock (objects stay loaded)
+            await session.commit()
+            return existing, False
+    return await create_url(session, url_in, user), True
+
+
+async def count_active_urls(session: AsyncSession, user: User) -> int:
+    """Active URLs of a user, summed over all shards."""
+    async def count_on_shard(shard_session: AsyncSession, shard: int) -> int:
+        result = await shard_session.execute(
+            select(func.count(URL.id)).where(URL.user_email == user.email, URL.is_active == True)
+        )
+        return result.scalar() or 0
+
+    if NUM_SHARDS == 1:
+        return await count_on_shard(session, 0)
+    return sum(await scatter(count_on_shard))
+
+
+async def create_url(session: AsyncSession, url_in: URLCreate, user: User) -> URL:
+    """Create a URL; `session` must be on the user's shard (see shard_for_user)."""
+    # Check plan-based URL limits
+    count = await count_active_urls(session, user)
 
     if user.plan == "free":
         if count >= 3:
@@ -32,22 +108,25 @@ async def create_url(session: AsyncSession, url_in: URLCreate, user: User) -> UR
         if count >= 100:
             raise HTTPException(status_code=403, detail="Premium plan limit reached (max 100 active URLs)")
 
-    # Create the URL record first to get an auto-generated ID
+    # Insert the URL record first to get an auto-generated ID, then set the
+    # code in the same transaction (it commits once, with its short_code)
+    long_url = str(url_in.long_url)
     new_url = URL(
-        long_url=str(url_in.long_url),
+        long_url=long_url,
+        long_url_hash=long_url_hash(long_url),
         expires_at=url_in.expires_at,
         user_email=user.email,
         click_count=0,
         click_limit=1000,
     )
     session.add(new_url)
-    await session.commit()
-    await session.refresh(new_url)
+    await session.flush()
 
-    # Turn the numeric ID into a short base62 code
-    short_code = encode_base62(new_url.id)
+    # Turn the numeric ID (and the shard) into a short base62 code
+    short_code = encode_code(new_url.id, shard_for_user(user.email))
     new_url.short_code = short_code
     await session.commit()
     await session.refresh(new_url)
+    code_filter.add(short_code)
     
     return new_url
@@ -0,0 +1,151 @@
+"""
+        _~_
+       (o o)   diegodebian
+      /  V  \────────────────────────────────────
+     /(  _  )\  URL Shortener API (MVP)
+       ^^ ^^     FastAPI • PostgreSQL • Docker • Nginx
+
+File   : sharding.py
+Author : Diego Parra
+Web    : https://diegodebian.online
+─────────────────────────────────────────────────
+
+Shard routing for urls, clicks and click_rollups.
+
+Every shard is a separate database with the same tables. Shard 0 is the
+main database (DB_NAME), which also holds `users`. The shard a URL lives on
+is part of its short code:
+
+    short_code = base62(SHARD_CODE_OFFSET + local_id * SHARD_CODE_SLOTS + shard)
+
+so redirects, stats and status changes go straight to one shard without a
+lookup. With the defaults (one shard, 1 slot, offset 0) this is exactly
+base62(id), the code format used before sharding. When moving an existing
+database to several shards, set SHARD_CODE_OFFSET above its highest
+urls.id: smaller numbers still decode as pre-sharding codes on shard 0.
+
+New URLs are placed on a shard by a hash of the owner's email. Per-user
+and admin-wide reads (dashboard stats, top-N, bulk moderation, exports)
+scatter-gather across all shards, so they stay correct when the shard
+count changes.
+"""
+
+import asyncio
+import hashlib
+from dataclasses import dataclass
+from typing import AsyncGenerator, Awaitable, Callable, List, Tuple, TypeVar
+
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from .core.config import SHARD_CODE_OFFSET, SHARD_CODE_SLOTS, SHARD_DATABASE_URLS
+from .database import AsyncSessionLocal, engine, read_session_factory
+from .models import URL, Click, ClickRollup
+from .utils import decode_base62, encode_base62
+
+T = TypeVar("T")
+
+NUM_SHARDS = len(SHARD_DATABASE_URLS)
+
+if SHARD_CODE_SLOTS < NUM_SHARDS:
+    raise RuntimeError(
+        f"SHARD_CODE_SLOTS ({SHARD_CODE_SLOTS}) must be at least the number of shards ({NUM_SHARDS})"
+    )
+
+# Tables that exist on every shard (users only lives on shard 0)
+SHARDED_TABLES = [URL.__table__, Click.__table__, ClickRollup.__table__]
+
+
+@dataclass(frozen=True)
+class Shard:
+    index: int
+    engine: AsyncEngine
+    session_factory: sessionmaker
+
+
+def _build_shards() -> List[Shard]:
+    shards = [Shard(0, engine, AsyncSessionLocal)]
+    for index, url in enumerate(SHARD_DATABASE_URLS[1:], start=1):
+        shard_engine = create_async_engine(url, echo=False, future=True)
+        shards.append(Shard(
+            index, shard_engine, sessionmaker(shard_engine, expire_on_commit=False, class_=AsyncSession)
+        ))
+    return shards
+
+
+shards = _build_shards()
+
+
+# ============================================================
+# Short code <-> (shard, local id)
+# ============================================================
+
+def encode_code(local_id: int, shard: int) -> str:
+    return encode_base62(SHARD_CODE_OFFSET + local_id * SHARD_CODE_SLOTS + shard)
+
+
+def split_number(number: int) -> Tuple[int, int]:
+    """(shard, local id) for a decoded short code number."""
+    if number < SHARD_CODE_OFFSET:
+        return 0, number
+    local_id, shard = divmod(number - SHARD_CODE_OFFSET, SHARD_CODE_SLOTS)
+    return shard, local_id
+
+
+def shard_for_code(short_code: str) -> int:
+    """Shard holding a short code. Malformed codes go to shard 0 (and 404 there)."""
+    if NUM_SHARDS == 1:
+        return 0
+    try:
+        shard, _ = split_number(decode_base62(short_code))
+    except ValueError:
+        return 0
+    return shard if shard < NUM_SHARDS else 0
+
+
+def shard_for_user(email: str) -> int:
+    """Shard new URLs of this user are created on."""
+    if NUM_SHARDS == 1:
+        return 0
+    digest = hashlib.blake2b(email.lower().encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "big") % NUM_SHARDS
+
+
+# ============================================================
+# Sessions
+# ============================================================
+
+async def get_code_session(short_code: str) -> AsyncGenerator[AsyncSession, None]:
+    """Yield a session on the shard that holds `short_code` (path parameter)."""
+    async with shards[shard_for_code(short_code)].session_factory() as session:
+        yield session
+
+
+async def get_code_read_session(short_code: str) -> AsyncGenerator[AsyncSession, None]:
+    """Read-only variant: shard 0 reads may go to the replica."""
+    index = shard_for_code(short_code)
+    session_factory = await read_session_factory() if index == 0 else shards[index].session_factory
+    async with session_factory() as session:
+        yield session
+
+
+async def scatter(fn: Callable[[AsyncSession, int], Awaitable[T]], read: bool = False) -> List[T]:
+    """Run fn(session, shard_index) on every shard concurrently; results in shard order."""
+
+    async def run(shard: Shard) -> T:
+        session_factory = shard.session_factory
+        if read and shard.index == 0:
+            session_factory = await read_session_factory()
+        async with session_factory() as session:
+            return await fn(session, shard.index)
+
+    if NUM_SHARDS == 1:
+        return [await run(shards[0])]
+    return list(await asyncio.gather(*(run(shard) for shard in shards)))
+
+
+async def create_shard_tables() -> None:
+    """Create the sharded tables on shards 1..N (shard 0 gets the full schema)."""
+    for shard in shards[1:]:
+        async with shard.engine.begin() as conn:
+            await conn.run_sync(URL.metadata.create_all, tables=SHARDED_TABLES)
@@ -0,0 +1,275 @@
+"""
+        _~_
+       (o o)   diegodebian
+      /  V  \────────────────────────────────────
+     /(  _  )\  URL Shortener API (MVP)
+       ^^ ^^     FastAPI • PostgreSQL • Docker • Nginx
+
+File   : static_assets.py
+Author : Diego Parra
+Web    : https://diegodebian.online
+─────────────────────────────────────────────────
+
+Precompressed static file serving for /static.
+
+StaticFiles reads redoc.standalone.js (~1 MB) from disk on every request and
+sends it uncompressed. This app instead loads every file once at startup
+and keeps it in memory in identity, gzip and (if the `brotli` package is
+installed) brotli encodings. Compressed variants are cached on disk by
+content hash, so a restart only recompresses files that changed.
+
+Maximum-quality brotli takes seconds on the ~1 MB ReDoc bundle, so it runs
+at image build time (`python -m app.static_assets --out DIR`). At startup,
+prebuilt variants are used when their hash matches. Anything missing is
+compressed at a lower brotli quality, so a cold container starts quickly.
+
+Per request the only work is header matching:
+
+- Accept-Encoding negotiation (br > gzip > identity, q=0 respected)
+- strong ETags per variant derived from the content hash; If-None-Match
+  -> 304 only when it names the representation being served
+- `?v=<hash>` URLs (see `url()`) are cached for a year as immutable;
+  unversioned URLs must revalidate, which costs a 304 at most
+- bodies are sent as prebuilt bytes, or as a zero-copy file send when the
+  server offers the ASGI `http.response.zerocopy` extension
+"""
+
+import argparse
+import gzip
+import hashlib
+import logging
+import mimetypes
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - brotli is optional
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+IMMUTABLE_CACHE = b"public, max-age=31536000, immutable"
+REVALIDATE_CACHE = b"public, no-cache"
+# Files smaller than this are not worth compressing
+MIN_COMPRESS_BYTES = 1024
+COMPRESSIBLE_TYPES = ("text/", "application/javascript", "application/json", "image/svg+xml")
+# Preference order when the client accepts several encodings equally
+ENCODING_PREFERENCE = ("br", "gzip", "identity")
+BROTLI_MAX_QUALITY = 11
+
+
+@dataclass
+class Variant:
+    encoding: str
+    body: bytes
+    etag: bytes
+    path: Optional[Path] = None   # on-disk copy, used for zero-copy sends
+
+
+@dataclass
+class Asset:
+    content_type: str
+    version: str
+    variants: Dict[str, Variant] = field(default_factory=dict)
+
+
+def _compress(encoding: str, data: bytes, brotli_quality: int = BROTLI_MAX_QUALITY) -> bytes:
+    if encoding == "br":
+        return brotli.compress(data, quality=brotli_quality)
+    return gzip.compress(data, compresslevel=9, mtime=0)
+
+
+def parse_accept_encoding(header: str) -> Dict[str, float]:
+    """Map each listed coding to its q-value ('*' included as given)."""
+    accepted = {}
+    for part in header.split(","):
+        name, _, params = part.strip().partition(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        accepted[name] = q
+    return accepted
+
+
+def choose_encoding(header: str, available) -> str:
+    """Best available encoding for an Accept-Encoding header."""
+    if not header:
+        return "identity"
+    accepted = parse_accept_encoding(header)
+    wildcard = accepted.get("*")
+
+    def q(encoding: str) -> float:
+        if encoding in accepted:
+            return accepted[encoding]
+        if wildcard is not None:
+            return wildcard
+        # identity is acceptable unless explicitly refused
+        return 1.0 if encoding == "identity" else 0.0
+
+    candidates = [enc for enc in ENCODING_PREFERENCE if enc in available and q(enc) > 0]
+    if not candidates:
+        return "identity"
+    return max(candidates, key=lambda enc: (q(enc), -ENCODING_PREFERENCE.index(enc)))
+
+
+class PrecompressedStatic:
+    """ASGI app serving a directory from memory with precompressed variants."""
+
+    def __init__(
+        self,
+        directory: str,
+        cache_dir: Optional[str] = None,
+        prebuilt_dir: Optional[str] = None,
+        brotli_quality: int = BROTLI_MAX_QUALITY,
+    ):
+        self.directory = Path(directory)
+        self.cache_dir = Path(cache_dir) if cache_dir else None
+        self.prebuilt_dir = Path(prebuilt_dir) if prebuilt_dir else None
+        self.brotli_quality = brotli_quality
+        self.encodings: List[str] = ["gzip"] + (["br"] if brotli is not None else [])
+        self.assets: Dict[str, Asset] = {}
+        self.load()
+
+    # --------------------------------------------------------
+    # Startup: hash and compress every file once
+    # --------------------------------------------------------
+
+    def load(self) -> None:
+        for path in sorted(self.directory.rglob("*")):
+            if path.is_file():
+                name = path.relative_to(self.directory).as_posix()
+                self.assets[name] = self._build(path)
+        logger.info("Static assets loaded: %d files, encodings %s", len(self.assets), self.encodings)
+
+    def _build(self, path: Path) -> Asset:
+        data = path.read_bytes()
+        digest = hashlib.sha256(data).hexdigest()[:16]
+        content_type = mimetypes.guess_type(path.name)[0] or "application/octet-stream"
+        if content_type.startswith("text/") or content_type == "application/javascript":
+            content_type += "; charset=utf-8"
+        asset = Asset(content_type=content_type, version=digest)
+        asset.variants["identity"] = Variant("identity", data, f'"{digest}"'.encode(), path)
+
+        if len(data) < MIN_COMPRESS_BYTES or not content_type.startswith(COMPRESSIBLE_TYPES):
+            return asset
+        for encoding in self.encodings:
+            body, cached = self._cached_variant(digest, encoding, data)
+            if len(body) < len(data):
+                asset.variants[encoding] = Variant(encoding, body, f'"{digest}-{encoding}"'.encode(), cached)
+        return asset
+
+    def _cached_variant(self, digest: str, encoding: str, data: bytes) -> Tuple[bytes, Optional[Path]]:
+        """Compressed bytes: prebuilt, from the on-disk cache, or compressed now (and cached)."""
+        name = f"{digest}.{encoding}"
+        if self.prebuilt_dir is not None and (self.prebuilt_dir / name).exists():
+            return (self.prebuilt_dir / name).read_bytes(), self.prebuilt_dir / name
+        if self.cache_dir is None:
+            return _compress(encoding, data, self.brotli_quality), None
+        cached = self.cache_dir / name
+        if cached.exists():
+            return cached.read_bytes(), cached
+        body = _compress(encoding, data, self.brotli_quality)
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            tmp = cached.with_suffix(cached.suffix + ".tmp")
+            tmp.write_bytes(body)
+            tmp.replace(cached)
+        except OSError:
+            logger.warning("Static cache %s not writable; keeping %s in memory only", self.cache_dir, encoding)
+            return body, None
+        return body, cached
+
+    def url(self, name: str, prefix: str = "/static") -> str:
+        """Versioned URL for an asset, served with immutable caching."""
+        return f"{prefix}/{name}?v={self.assets[name].version}"
+
+    # --------------------------------------------------------
+    # Requests
+    # --------------------------------------------------------
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            if scope["type"] == "websocket":
+                await send({"type": "websocket.close", "code": 1000})
+            return
+        method = scope["method"]
+        if method not in ("GET", "HEAD"):
+            await self._send_plain(send, 405, b"Method Not Allowed", [(b"allow", b"GET, HEAD")])
+            return
+        # Under a Mount, root_path ends with the mount prefix and path is the full path
+        path, root_path = scope["path"], scope.get("root_path", "")
+        if root_path and path.startswith(root_path):
+            path = path[len(root_path):]
+        asset = self.assets.get(path.lstrip("/"))
+        if asset is None:
+            await self._send_plain(send, 404, b"Not Found")
+            return
+
+        request_headers = dict(scope["headers"])
+        variant = asset.variants[choose_encoding(
+            request_headers.get(b"accept-encoding", b"").decode("latin-1"), asset.variants
+        )]
+        versioned = f"v={asset.version}".encode() in scope.get("query_string", b"").split(b"&")
+        headers = [
+            (b"etag", variant.etag),
+            (b"cache-control", IMMUTABLE_CACHE if versioned else REVALIDATE_CACHE),
+            (b"vary", b"Accept-Encoding"),
+        ]
+        if variant.encoding != "identity":
+            headers.append((b"content-encoding", variant.encoding.encode()))
+
+        if_none_match = request_headers.get(b"if-none-match")
+        if if_none_match is not None and self._matches(if_none_match, variant):
+            await send({"type": "http.response.start", "status": 304, "headers": headers})
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        headers += [
+            (b"content-type", asset.content_type.encode()),
+            (b"content-length", str(len(variant.body)).encode()),
+        ]
+        await send({"type": "http.response.start", "status": 200, "headers": headers})
+        if method == "HEAD":
+            await send({"type": "http.response.body", "body": b""})
+        elif variant.path is not None and "http.response.zerocopy" in scope.get("extensions", {}):
+            with open(variant.path, "rb") as f:
+                await send({"type": "http.response.zerocopy", "file": f, "count": len(variant.body)})
+        else:
+            await send({"type": "http.response.body", "body": variant.body})
+
+    @staticmethod
+    def _matches(if_none_match: bytes, variant: Variant) -> bool:
+        """Weak comparison against the tag of the representation being served (or *)."""
+        if if_none_match.strip() == b"*":
+            return True
+        tags = {tag.strip().removeprefix(b"W/") for tag in if_none_match.split(b",")}
+        return variant.etag in tags
+
+    @staticmethod
+    async def _send_plain(send, status: int, body: bytes, extra_headers: Optional[list] = None) -> None:
+        headers = [(b"content-type", b"text/plain; charset=utf-8"), (b"content-length", str(len(body)).encode())]
+        await send({"type": "http.response.start", "status": status, "headers": headers + (extra_headers or [])})
+        await send({"type": "http.response.body", "body": body})
+
+
+def main() -> None:
+    """Build step: compress every static file at maximum quality into --out."""
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument("--out", default="static_precompressed", help="Output directory (STATIC_PREBUILT_DIR)")
+    parser.add_argument("--directory", default=str(Path(__file__).parent / "static"), help="Static files")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    PrecompressedStatic(args.directory, cache_dir=args.out, brotli_quality=BROTLI_MAX_QUALITY)
+
+
+if __name__ == "__main__":
+    main()
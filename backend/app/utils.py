@@ -11,7 +11,10 @@ Web    : https://diegodebian.online
 ─────────────────────────────────────────────────
 """
 
+import hashlib
 import string
+from datetime import datetime, timezone
+from typing import Optional
 
 BASE62_ALPHABET = string.digits + string.ascii_letters  # 0-9 + A-Z + a-z
 
@@ -25,4 +28,30 @@ def encode_base62(num: int) -> str:
     while num > 0:
         num, rem = divmod(num, base)
         encoded.append(BASE62_ALPHABET[rem])
-    return "".join(reversed(encoded))
\ No newline at end of file
+    return "".join(reversed(encoded))
+
+
+def decode_base62(code: str) -> int:
+    """Decode a base62 string back into an integer. Raises ValueError on bad input."""
+    if not code:
+        raise ValueError("Empty base62 string")
+    base = len(BASE62_ALPHABET)
+    num = 0
+    for char in code:
+        index = BASE62_ALPHABET.find(char)
+        if index < 0:
+            raise ValueError(f"Invalid base62 character: {char!r}")
+        num = num * base + index
+    return num
+
+
+def to_naive_utc(value: Optional[datetime]) -> Optional[datetime]:
+    """Query params may carry a timezone; the database stores naive UTC."""
+    if value is not None and value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def long_url_hash(long_url: str) -> int:
+    """Fixed-width hash of a long URL: first 8 bytes of SHA-256 as a signed 64-bit int."""
+    return int.from_bytes(hashlib.sha256(long_url.encode("utf-8")).digest()[:8], "big", signed=True)
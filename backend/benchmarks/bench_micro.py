@@ -0,0 +1,196 @@
+"""
+        _~_
+       (o o)   diegodebian
+      /  V  \────────────────────────────────────
+     /(  _  )\  URL Shortener API (MVP)
+       ^^ ^^     FastAPI • PostgreSQL • Docker • Nginx
+
+File   : bench_micro.py
+Author : Diego Parra
+Web    : https://diegodebian.online
+─────────────────────────────────────────────────
+
+Micro-benchmarks for the per-request building blocks, checked against a
+stored baseline.
+
+Cases: base62 encoding, JWT create/decode, URLCreate/URLInfo validation and
+serialization, and SQL compilation of the get_redirect UPDATE. No database
+or network is needed.
+
+Timings depend on the machine and its load, so every case is timed in
+rounds, each paired with a fixed pure-Python calibration loop run right
+before it. The comparison uses the median of the per-round ratios
+(case / calibration). A case over --threshold is re-measured --confirm more
+times and only counts as a regression if it is over on every attempt; then
+the run exits with status 1, so it can gate CI.
+
+Usage (from backend/):
+    python -m benchmarks.bench_micro
+    python -m benchmarks.bench_micro --threshold 0.5
+    python -m benchmarks.bench_micro --update-baseline     # after an intended change
+"""
+
+import argparse
+import json
+import platform
+import statistics
+import sys
+import timeit
+from datetime import datetime, timedelta
+from pathlib import Path
+from types import SimpleNamespace
+
+from sqlalchemy.dialects.postgresql.asyncpg import PGDialect_asyncpg
+
+from app.core.security import create_access_token, decode_access_token
+from app.schemas import URLCreate, URLInfo
+from app.services.redirect_service import redirect_update
+from app.utils import encode_base62
+
+BASELINE_PATH = Path(__file__).with_name("baseline.json")
+
+# Target duration of one timed batch (calibration or case)
+BATCH_SECONDS = 0.005
+
+
+def calibration() -> int:
+    """Fixed workload used to normalise timings across machines."""
+    total = 0
+    for i in range(1000):
+        total += i * i % 7
+    return total
+
+
+def build_cases() -> dict:
+    token = create_access_token({"sub": "user@test.local"}, timedelta(minutes=30))
+    create_payload = {"long_url": "https://example.com/articles/42?utm_source=newsletter"}
+    url_row = SimpleNamespace(
+        id=123456,
+        short_code=encode_base62(123456),
+        long_url="https://example.com/articles/42?utm_source=newsletter",
+        created_at=datetime(2026, 1, 9, 19, 0, 0),
+        expires_at=None,
+        is_active=True,
+    )
+    url_info = URLInfo.model_validate(url_row)
+    dialect = PGDialect_asyncpg()
+    now = datetime(2026, 1, 9, 19, 0, 0)
+    ids = range(56_800_235_583, 56_800_235_683)  # 6-7 character codes
+
+    return {
+        # 100 ids per call: a single encode is too short to time reliably
+        "encode_base62_x100": lambda: [encode_base62(num) for num in ids],
+        "jwt_create": lambda: create_access_token({"sub": "user@test.local"}, timedelta(minutes=30)),
+        "jwt_decode": lambda: decode_access_token(token),
+        "urlcreate_validate": lambda: URLCreate.model_validate(create_payload),
+        "urlinfo_validate": lambda: URLInfo.model_validate(url_row),
+        "urlinfo_dump_json": lambda: url_info.model_dump_json(),
+        "redirect_update_compile": lambda: redirect_update("4C92", now).compile(dialect=dialect),
+    }
+
+
+def batch_size(fn) -> int:
+    """Calls per timed batch so one batch takes about BATCH_SECONDS."""
+    fn()  # warm up
+    number = 1
+    while True:
+        elapsed = timeit.timeit(fn, number=number)
+        if elapsed >= BATCH_SECONDS / 4:
+            return max(1, round(number * BATCH_SECONDS / elapsed))
+        number *= 4
+
+
+def measure(fn, rounds: int) -> tuple:
+    """
+    Median microseconds per call, median ratio to the calibration loop and
+    median calibration time (us).
+
+    Each round times the calibration and then the case back to back (best of
+    3 batches each), so both see the same machine load.
+    """
+    calibration_number, number = batch_size(calibration), batch_size(fn)
+    calibrations, timings, ratios = [], [], []
+    for _ in range(rounds):
+        calibration_s = min(timeit.repeat(calibration, number=calibration_number, repeat=3)) / calibration_number
+        per_call_s = min(timeit.repeat(fn, number=number, repeat=3)) / number
+        calibrations.append(calibration_s)
+        timings.append(per_call_s)
+        ratios.append(per_call_s / calibration_s)
+    return statistics.median(timings) * 1e6, statistics.median(ratios), statistics.median(calibrations) * 1e6
+
+
+def load_baseline() -> dict:
+    if not BASELINE_PATH.exists():
+        return {}
+    return json.loads(BASELINE_PATH.read_text())
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rounds", type=int, default=15, help="Timing rounds per case (default 15)")
+    parser.add_argument("--threshold", type=float, default=0.4,
+                        help="Allowed slowdown vs baseline, as a fraction (default 0.4 = 40%%)")
+    parser.add_argument("--confirm", type=int, default=2,
+                        help="Re-measurements a case must also fail to count as a regression (default 2)")
+    parser.add_argument("--update-baseline", action="store_true", help="Write this run as the new baseline")
+    parser.add_argument("--only", nargs="+", metavar="CASE", help="Run only these cases")
+    args = parser.parse_args()
+
+    cases = build_cases()
+    if args.only:
+        unknown = set(args.only) - set(cases)
+        if unknown:
+            sys.exit(f"Unknown cases: {', '.join(sorted(unknown))}. Available: {', '.join(cases)}")
+        cases = {name: fn for name, fn in cases.items() if name in args.only}
+
+    baseline = load_baseline()
+    base_ratios = baseline.get("ratios", {})
+
+    print(f"Python {platform.python_version()}, {args.rounds} rounds per case")
+    if not base_ratios:
+        print(f"No baseline at {BASELINE_PATH.name}; run with --update-baseline to create one.")
+    print(f"\n  {'case':<26} {'us/call':>10} {'baseline':>10} {'change':>9}")
+
+    results, ratios, calibrations, regressions = {}, {}, [], []
+    for name, fn in cases.items():
+        per_call_us, ratio, calibration_us = measure(fn, args.rounds)
+        results[name], ratios[name] = round(per_call_us, 3), round(ratio, 4)
+        calibrations.append(calibration_us)
+        line = f"  {name:<26} {per_call_us:10.2f}"
+        if name in base_ratios and not args.update_baseline:
+            # Expected time under this case's calibration, from the baseline ratio
+            expected = base_ratios[name] * calibration_us
+            change = ratio / base_ratios[name] - 1
+            attempts = 0
+            while change > args.threshold and attempts < args.confirm:
+                # Re-measure before blaming the code for a noisy round
+                attempts += 1
+                change = min(change, measure(fn, args.rounds)[1] / base_ratios[name] - 1)
+            flag = "  REGRESSION" if change > args.threshold else ""
+            line += f" {expected:10.2f} {change:+8.1%}{flag}"
+            if flag:
+                regressions.append(name)
+        print(line)
+
+    if args.update_baseline:
+        # Cases not re-run keep their baseline
+        merged_cases = {**baseline.get("cases", {}), **results}
+        merged_ratios = {**base_ratios, **ratios}
+        BASELINE_PATH.write_text(json.dumps({
+            "python": platform.python_version(),
+            "calibration_us": round(statistics.median(calibrations), 3),
+            "cases": merged_cases,
+            "ratios": merged_ratios,
+        }, indent=2) + "\n")
+        print(f"\nBaseline written to {BASELINE_PATH}")
+        return
+
+    if regressions:
+        print(f"\nFAILED: {len(regressions)} case(s) slower than baseline by more than {args.threshold:.0%}: "
+              f"{', '.join(regressions)}")
+        sys.exit(1)
+    print("\nOK: no regressions beyond threshold.")
+
+
+if __name__ == "__main__":
+    main()
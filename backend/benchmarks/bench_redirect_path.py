@@ -0,0 +1,142 @@
+"""
+        _~_
+       (o o)   diegodebian
+      /  V  \────────────────────────────────────
+     /(  _  )\  URL Shortener API (MVP)
+       ^^ ^^     FastAPI • PostgreSQL • Docker • Nginx
+
+File   : bench_redirect_path.py
+Author : Diego Parra
+Web    : https://diegodebian.online
+─────────────────────────────────────────────────
+
+Per-request framework cost of GET /{short_code}: FastAPI route vs
+FAST_REDIRECT.
+
+Both paths run the real ASGI stacks from app.main: the FastAPI route
+(router matching, dependency injection, RedirectResponse) and the
+FastRedirectMiddleware inside Starlette's server error middleware, as
+add_middleware places it. redirect_service.get_redirect is replaced by a
+stub, so the numbers show only what each path adds around the database
+work. Before timing, both paths are checked to return the same status,
+headers and body for a redirect, a 404 and a 410.
+
+No database is needed; admission control is left off.
+
+Usage (from backend/):
+    python -m benchmarks.bench_redirect_path
+    python -m benchmarks.bench_redirect_path --number 20000
+"""
+
+import argparse
+import asyncio
+import os
+import time
+
+# The default app must not include the fast path itself
+os.environ["FAST_REDIRECT"] = "false"
+os.environ["ADMISSION_CONTROL"] = "false"
+
+from fastapi import HTTPException
+from starlette.middleware.errors import ServerErrorMiddleware
+
+from app.fast_redirect import FastRedirectMiddleware
+from app.main import app as default_app
+from app.services import redirect_service
+
+TARGET = "https://example.com/articles/42?utm_source=newsletter&q=a b"
+
+
+async def stub_get_redirect(session, short_code, referrer, user_agent, client_ip=None) -> str:
+    if short_code == "gone":
+        raise HTTPException(status_code=410, detail="Short URL has expired")
+    if short_code == "nope":
+        raise HTTPException(status_code=404, detail="Short URL not found")
+    return TARGET
+
+
+def make_scope(short_code: str) -> dict:
+    return {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": f"/{short_code}",
+        "raw_path": f"/{short_code}".encode(),
+        "root_path": "",
+        "query_string": b"",
+        "headers": [
+            (b"host", b"u.example.com"),
+            (b"user-agent", b"Mozilla/5.0 (X11; Linux x86_64) Firefox/125.0"),
+            (b"referer", b"https://news.example.org/"),
+            (b"x-real-ip", b"203.0.113.7"),
+            (b"accept", b"*/*"),
+        ],
+        "client": ("127.0.0.1", 50000),
+        "server": ("127.0.0.1", 8000),
+    }
+
+
+async def receive() -> dict:
+    return {"type": "http.request", "body": b"", "more_body": False}
+
+
+async def call(app, scope: dict):
+    """Run one request; returns (status, headers, body)."""
+    messages = []
+
+    async def send(message):
+        messages.append(message)
+
+    await app(dict(scope), receive, send)
+    start = messages[0]
+    body = b"".join(message.get("body", b"") for message in messages[1:])
+    return start["status"], sorted(start["headers"]), body
+
+
+async def timed(app, scope: dict, number: int) -> float:
+    """Best-of-5 microseconds per request."""
+    best = float("inf")
+    for _ in range(5):
+        started = time.perf_counter()
+        for _ in range(number):
+            await call(app, scope)
+        best = min(best, time.perf_counter() - started)
+    return best / number * 1e6
+
+
+async def run(number: int) -> None:
+    fast_app = ServerErrorMiddleware(FastRedirectMiddleware(default_app))
+
+    print("Parity check")
+    for code in ("4C92", "nope", "gone"):
+        default = await call(default_app, make_scope(code))
+        fast = await call(fast_app, make_scope(code))
+        status = "ok" if default == fast else f"MISMATCH\n    default: {default}\n    fast:    {fast}"
+        print(f"  /{code:<6} {default[0]}  {status}")
+
+    print(f"\nRequests per timing run: {number}")
+    for code, label in (("4C92", "302 redirect"), ("nope", "404 not found")):
+        scope = make_scope(code)
+        await call(default_app, scope)  # warm up
+        await call(fast_app, scope)
+        before = await timed(default_app, scope, number)
+        after = await timed(fast_app, scope, number)
+        print(f"\n{label}")
+        print(f"  {'FastAPI route':<28} {before:10.1f} us/request")
+        print(f"  {'FAST_REDIRECT':<28} {after:10.1f} us/request")
+        print(f"  {'speedup':<28} {before / after:10.1f}x")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--number", type=int, default=5000, help="Requests per timing run (default 5000)")
+    args = parser.parse_args()
+
+    redirect_service.get_redirect = stub_get_redirect
+    asyncio.run(run(args.number))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+"""
+        _~_
+       (o o)   diegodebian
+      /  V  \────────────────────────────────────
+     /(  _  )\  URL Shortener API (MVP)
+       ^^ ^^     FastAPI • PostgreSQL • Docker • Nginx
+
+File   : bench_serialization.py
+Author : Diego Parra
+Web    : https://diegodebian.online
+─────────────────────────────────────────────────
+
+Serialization cost per response: default Pydantic path vs FAST_JSON_RESPONSES.
+
+The default path is what FastAPI does for our handlers today: build the
+schema objects, validate them again against `response_model`
+(fastapi.routing.serialize_response) and render a JSONResponse. The fast
+path builds dicts from the rows and renders a FastJSONResponse.
+
+No database is needed, rows are simulated in memory.
+
+Usage (from backend/):
+    python -m benchmarks.bench_serialization
+    python -m benchmarks.bench_serialization --rows 100 --number 2000
+"""
+
+import argparse
+import asyncio
+import timeit
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from typing import List
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+
+from app import serialization
+from app.schemas import ClickAggregate, ClickBucket, TopURLInfo, URLInfo, URLStats
+
+
+def make_url_row(i: int) -> SimpleNamespace:
+    return SimpleNamespace(
+        id=i,
+        short_code=f"c{i}",
+        long_url=f"https://example.com/articles/{i}?utm_source=newsletter",
+        created_at=datetime(2026, 1, 9, 19, 0, 0) + timedelta(minutes=i),
+        expires_at=None,
+        is_active=True,
+        click_count=1000 - i,
+        user_email=f"user{i}@test.local",
+    )
+
+
+def make_day_rows(n: int) -> List[SimpleNamespace]:
+    start = datetime(2026, 1, 1)
+    return [SimpleNamespace(bucket=start + timedelta(days=i), clicks=i * 3) for i in range(n)]
+
+
+def run_async(coro):
+    return asyncio.get_event_loop().run_until_complete(coro)
+
+
+def bench(label: str, fn, number: int) -> float:
+    fn()  # warm up
+    seconds = min(timeit.repeat(fn, number=number, repeat=5))
+    per_call_us = seconds / number * 1e6
+    print(f"  {label:<28} {per_call_us:10.1f} us/response")
+    return per_call_us
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=20, help="Rows in top-urls / days in stats (default 20)")
+    parser.add_argument("--number", type=int, default=1000, help="Responses per timing run (default 1000)")
+    args = parser.parse_args()
+
+    url_rows = [make_url_row(i) for i in range(args.rows)]
+    day_rows = make_day_rows(args.rows)
+    window = {
+        "granularity": "day",
+        "from": day_rows[0].bucket,
+        "to": day_rows[-1].bucket,
+        "unique_visitors": 42,
+    }
+
+    top_field = create_response_field(name="top", type_=List[TopURLInfo], mode="serialization")
+    info_field = create_response_field(name="info", type_=URLInfo, mode="serialization")
+    stats_field = create_response_field(name="stats", type_=URLStats, mode="serialization")
+
+    def default_top_urls():
+        content = [
+            TopURLInfo(
+                short_code=row.short_code,
+                long_url=str(row.long_url),
+                click_count=row.click_count or 0,
+                user_email=row.user_email,
+                is_active=row.is_active,
+            )
+            for row in url_rows
+        ]
+        body = run_async(serialize_response(field=top_field, response_content=content))
+        return JSONResponse(body).body
+
+    def fast_top_urls():
+        return serialization.FastJSONResponse([serialization.top_url_info(row) for row in url_rows]).body
+
+    def default_url_info():
+        content = URLInfo.model_validate(url_rows[0])
+        body = run_async(serialize_response(field=info_field, response_content=content))
+        return JSONResponse(body).body
+
+    def fast_url_info():
+        return serialization.FastJSONResponse(serialization.url_info(url_rows[0])).body
+
+    def default_stats():
+        content = URLStats(
+            url=URLInfo.model_validate(url_rows[0]),
+            total_clicks=url_rows[0].click_count,
+            by_date=[ClickAggregate(date=row.bucket.date(), clicks=row.clicks) for row in day_rows],
+            granularity=window["granularity"],
+            from_=window["from"],
+            to=window["to"],
+            unique_visitors=window["unique_visitors"],
+            series=[ClickBucket(bucket=row.bucket, clicks=row.clicks) for row in day_rows],
+        )
+        body = run_async(serialize_response(field=stats_field, response_content=content))
+        return JSONResponse(body).body
+
+    def fast_stats():
+        return serialization.FastJSONResponse(
+            serialization.url_stats(url_rows[0], url_rows[0].click_count, window, day_rows)
+        ).body
+
+    encoder = "orjson" if serialization.orjson is not None else "stdlib json (orjson not installed)"
+    print(f"Fast path encoder: {encoder}")
+    print(f"Rows per list response: {args.rows}, responses per run: {args.number}\n")
+
+    cases = [
+        ("GET /api/admin/stats/top-urls", default_top_urls, fast_top_urls),
+        ("POST /api/urls (URLInfo)", default_url_info, fast_url_info),
+        ("GET /api/urls/{code}/stats", default_stats, fast_stats),
+    ]
+    for name, default_fn, fast_fn in cases:
+        print(name)
+        before = bench("default (pydantic + json)", default_fn, args.number)
+        after = bench("fast (dict + orjson)", fast_fn, args.number)
+        print(f"  {'speedup':<28} {before / after:10.1f}x\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+"""
+        _~_
+       (o o)   diegodebian
+      /  V  \────────────────────────────────────
+     /(  _  )\  URL Shortener API (MVP)
+       ^^ ^^     FastAPI • PostgreSQL • Docker • Nginx
+
+File   : test_admission.py
+Author : Diego Parra
+Web    : https://diegodebian.online
+─────────────────────────────────────────────────
+
+AdmissionController: priority hand-off, shedding and cancellation.
+"""
+
+import asyncio
+
+import pytest
+
+from app.core.admission import AdmissionController, RouteClass, classify
+
+
+def make_controller(capacity: int = 15) -> AdmissionController:
+    """The default class table."""
+    classes = [
+        ("redirect", 15, 200, 2.0),
+        ("auth", 8, 50, 2.0),
+        ("create", 6, 50, 1.0),
+        ("analytics", 4, 20, 0.5),
+    ]
+    return AdmissionController(capacity, {
+        name: RouteClass(name, priority, limit, queue, wait)
+        for priority, (name, limit, queue, wait) in enumerate(classes)
+    })
+
+
+async def fill(controller: AdmissionController, name: str, count: int) -> None:
+    for _ in range(count):
+        assert await controller.acquire(name)
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+@pytest.mark.parametrize("method, path, expected", [
+    ("GET", "/4C92", "redirect"),
+    ("POST", "/api/auth/login", "auth"),
+    ("GET", "/api/me", "auth"),
+    ("POST", "/api/urls", "create"),
+    ("GET", "/api/urls", "analytics"),
+    ("GET", "/api/me/stats", "analytics"),
+    ("GET", "/api/health", None),
+    ("GET", "/static/app.js", None),
+    ("GET", "/", None),
+])
+def test_classify(method, path, expected):
+    assert classify(method, path) == expected
+
+
+def test_freed_slot_goes_to_the_highest_priority_waiter():
+    async def scenario():
+        controller = make_controller(capacity=2)
+        await fill(controller, "analytics", 2)
+        analytics = asyncio.create_task(controller.acquire("analytics"))
+        redirect = asyncio.create_task(controller.acquire("redirect"))
+        await asyncio.sleep(0)
+        controller.release("analytics")
+        assert await asyncio.wait_for(redirect, timeout=0.1)
+        assert controller.snapshot()["classes"]["analytics"]["queued"] == 1
+        controller.release("analytics")
+        assert await analytics
+        assert controller.in_use == 2
+
+    run(scenario())
+
+
+def test_new_requests_queue_behind_runnable_higher_waiters():
+    async def scenario():
+        controller = make_controller(capacity=2)
+        await fill(controller, "redirect", 2)
+        waiting = asyncio.create_task(controller.acquire("redirect"))
+        await asyncio.sleep(0)
+        controller.release("redirect")
+        controller.release("redirect")
+        # The queued redirect took one freed slot; create may use the other
+        assert await waiting
+        assert await controller.acquire("create")
+
+    run(scenario())
+
+
+def test_capped_higher_class_does_not_block_idle_budget():
+    async def scenario():
+        controller = make_controller()
+        await fill(controller, "auth", 8)
+        auth = asyncio.create_task(controller.acquire("auth"))
+        await asyncio.sleep(0)
+        assert controller.snapshot()["classes"]["auth"]["queued"] == 1
+        assert controller.in_use == 8
+        # auth waits on its own cap; 7 slots are idle
+        assert await asyncio.wait_for(controller.acquire("analytics"), timeout=0.1)
+        assert await asyncio.wait_for(controller.acquire("create"), timeout=0.1)
+        assert controller.snapshot()["classes"]["analytics"]["shed_timeout"] == 0
+        controller.release("auth")
+        assert await auth
+
+    run(scenario())
+
+
+def test_queue_full_is_shed_immediately():
+    async def scenario():
+        controller = make_controller()
+        controller.classes["analytics"].max_queue = 1
+        await fill(controller, "analytics", 4)
+        queued = asyncio.create_task(controller.acquire("analytics"))
+        await asyncio.sleep(0)
+        assert not await controller.acquire("analytics")
+        assert controller.snapshot()["classes"]["analytics"]["shed_queue_full"] == 1
+        queued.cancel()
+
+    run(scenario())
+
+
+def test_wait_timeout_is_shed():
+    async def scenario():
+        controller = make_controller()
+        controller.classes["analytics"].max_wait = 0.01
+        await fill(controller, "analytics", 4)
+        assert not await controller.acquire("analytics")
+        stats = controller.snapshot()["classes"]["analytics"]
+        assert (stats["shed_timeout"], stats["queued"], stats["in_flight"]) == (1, 0, 4)
+
+    run(scenario())
+
+
+def test_cancelled_waiter_leaves_the_queue():
+    async def scenario():
+        controller = make_controller()
+        await fill(controller, "analytics", 4)
+        waiter = asyncio.create_task(controller.acquire("analytics"))
+        await asyncio.sleep(0)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        assert controller.snapshot()["classes"]["analytics"]["queued"] == 0
+        controller.release("analytics")
+        assert controller.in_use == 3
+
+    run(scenario())
+
+
+def test_cancel_after_hand_off_returns_the_slot():
+    async def scenario():
+        controller = make_controller()
+        await fill(controller, "analytics", 4)
+        waiter = asyncio.create_task(controller.acquire("analytics"))
+        await asyncio.sleep(0)
+        # Slot handed over, then the client goes away before the task resumes
+        controller.release("analytics")
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        assert controller.in_use == 3
+        assert controller.snapshot()["classes"]["analytics"]["in_flight"] == 3
+
+    run(scenario())
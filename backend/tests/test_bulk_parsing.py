@@ -0,0 +1,79 @@
+"""
+        _~_
+       (o o)   diegodebian
+      /  V  \────────────────────────────────────
+     /(  _  )\  URL Shortener API (MVP)
+       ^^ ^^     FastAPI • PostgreSQL • Docker • Nginx
+
+File   : test_bulk_parsing.py
+Author : Diego Parra
+Web    : https://diegodebian.online
+─────────────────────────────────────────────────
+
+Bulk admin input parsing and filter escaping.
+"""
+
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from app.schemas import URLFilter, UserFilter
+from app.services.bulk_service import escape_like, parse_rows, url_filter_conditions, user_filter_conditions
+
+
+def compiled(condition):
+    """(SQL text, bound parameter values) for a filter condition."""
+    dialect = postgresql.dialect()
+    # As set on connect by servers with standard_conforming_strings on
+    dialect._backslash_escapes = False
+    result = condition.compile(dialect=dialect)
+    return str(result), sorted(map(str, result.params.values()))
+
+
+def test_parse_csv_with_bom_and_padding():
+    body = "﻿email , plan\n a@example.com , pro \nb@example.com,free\n".encode()
+    assert parse_rows(body, "text/csv") == [
+        {"email": "a@example.com", "plan": "pro"},
+        {"email": "b@example.com", "plan": "free"},
+    ]
+
+
+def test_parse_csv_drops_extra_unnamed_columns():
+    body = b"short_code,is_active\nabc,false,extra\n"
+    assert parse_rows(body, "text/csv; charset=utf-8") == [{"short_code": "abc", "is_active": "false"}]
+
+
+def test_parse_ndjson_skips_blank_lines():
+    body = b'{"short_code": "abc", "is_active": false}\n\n  \n{"short_code": "def"}\n'
+    assert parse_rows(body, "application/x-ndjson") == [
+        {"short_code": "abc", "is_active": False},
+        {"short_code": "def"},
+    ]
+
+
+def test_parse_ndjson_rejects_malformed_lines():
+    with pytest.raises(ValueError):
+        parse_rows(b'{"short_code": "abc"}\n{not json}\n', "application/x-ndjson")
+
+
+def test_parse_empty_body():
+    assert parse_rows(b"", "application/x-ndjson") == []
+    assert parse_rows(b"", "text/csv") == []
+
+
+def test_escape_like():
+    assert escape_like("example.com") == "example.com"
+    assert escape_like("50%_off") == "50\\%\\_off"
+    assert escape_like("a\\b") == "a\\\\b"
+
+
+def test_filters_match_wildcards_literally():
+    (condition,) = url_filter_conditions(URLFilter(domain=".Ex_ample.com"))
+    sql, params = compiled(condition)
+    assert "ESCAPE '\\'" in sql
+    assert "%.ex\\_ample.com" in params
+    assert "ex_ample.com" in params
+
+    (condition,) = user_filter_conditions(UserFilter(email_domain="@100%.org"))
+    sql, params = compiled(condition)
+    assert "ESCAPE '\\'" in sql
+    assert params == ["%@100\\%.org"]
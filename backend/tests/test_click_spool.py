@@ -0,0 +1,107 @@
+"""
+        _~_
+       (o o)   diegodebian
+      /  V  \────────────────────────────────────
+     /(  _  )\  URL Shortener API (MVP)
+       ^^ ^^     FastAPI • PostgreSQL • Docker • Nginx
+
+File   : test_click_spool.py
+Author : Diego Parra
+Web    : https://diegodebian.online
+─────────────────────────────────────────────────
+
+Click spool record encoding, segment reading and event validation. Only the
+writer runs; replay (which needs the database) is not started.
+"""
+
+import asyncio
+import json
+from datetime import datetime
+
+import pytest
+
+from app.services.click_spool import ClickSpool
+
+EVENT_TIME = datetime(2024, 6, 15, 12, 30, 5, 123456)
+
+
+async def record_and_seal(spool: ClickSpool, clicks) -> None:
+    spool._wake, spool._io_lock = asyncio.Event(), asyncio.Lock()
+    spool._claim_slot()
+    spool._open_segment()
+    writer = asyncio.create_task(spool._flush_loop())
+    try:
+        results = await asyncio.gather(*(spool.record(**click) for click in clicks))
+        assert all(results)
+        await spool.seal_active()
+    finally:
+        writer.cancel()
+        spool._file.close()
+        spool._lock_file.close()
+
+
+def make_spool(tmp_path, shards: int = 2) -> ClickSpool:
+    spool = ClickSpool(str(tmp_path / "spool"))
+    spool._session_factories = [None] * shards
+    return spool
+
+
+def test_recorded_events_round_trip(tmp_path):
+    spool = make_spool(tmp_path)
+    clicks = [
+        dict(url_id=7, event_time=EVENT_TIME, referrer="https://news.example.org/",
+             user_agent="Firefox", visitor=2**63 + 5, counted=True, shard=1),
+        dict(url_id=8, event_time=EVENT_TIME, referrer=None, user_agent=None, visitor=None, counted=False),
+    ]
+    asyncio.run(record_and_seal(spool, clicks))
+
+    (segment,) = spool._sealed_segments()
+    events = ClickSpool._read_segment(segment)
+    assert [(e["url_id"], e["shard"], e["counted"]) for e in events] == [(7, 1, True), (8, 0, False)]
+    first = events[0]
+    assert first["visitor"] == 2**63 + 5
+    assert datetime.fromisoformat(first["event_time"]) == EVENT_TIME
+    assert first["referrer"] == "https://news.example.org/"
+    assert len({e["event_id"] for e in events}) == 2
+    for event in events:
+        spool._check_event(event)
+    assert spool.appended == 2
+
+
+def test_torn_lines_are_skipped(tmp_path):
+    segment = tmp_path / "000000000001.seg"
+    segment.write_bytes(b'{"event_id": "a", "url_id": 1}\n{"event_id": "b", "url_\n')
+    assert ClickSpool._read_segment(segment) == [{"event_id": "a", "url_id": 1}]
+
+
+@pytest.mark.parametrize("event", [
+    ["not", "an", "object"],
+    {"url_id": 1, "event_time": EVENT_TIME.isoformat()},
+    {"event_id": "a", "url_id": "1", "event_time": EVENT_TIME.isoformat()},
+    {"event_id": "a", "url_id": 1, "event_time": "yesterday"},
+    {"event_id": "a", "url_id": 1, "event_time": EVENT_TIME.isoformat(), "shard": 2},
+    {"event_id": "a", "url_id": 1, "event_time": EVENT_TIME.isoformat(), "shard": "0"},
+])
+def test_check_event_rejects_unloadable_events(tmp_path, event):
+    with pytest.raises(ValueError):
+        make_spool(tmp_path)._check_event(event)
+
+
+def test_check_event_accepts_events_without_shard(tmp_path):
+    make_spool(tmp_path)._check_event({"event_id": "a", "url_id": 1, "event_time": EVENT_TIME.isoformat()})
+
+
+def test_quarantine_appends_to_the_slot_reject_file(tmp_path):
+    spool = make_spool(tmp_path)
+    spool.root.mkdir()
+    spool.slot = 3
+    spool._quarantine({"event_id": "a"}, "missing url_id")
+    spool._quarantine("garbage", "not an object")
+
+    lines = (spool.root / "rejected" / "slot-3.ndjson").read_text().splitlines()
+    records = [json.loads(line) for line in lines]
+    assert [(r["event"], r["error"]) for r in records] == [
+        ({"event_id": "a"}, "missing url_id"),
+        ("garbage", "not an object"),
+    ]
+    assert spool.quarantined == 2
@@ -0,0 +1,115 @@
+"""
+        _~_
+       (o o)   diegodebian
+      /  V  \────────────────────────────────────
+     /(  _  )\  URL Shortener API (MVP)
+       ^^ ^^     FastAPI • PostgreSQL • Docker • Nginx
+
+File   : test_code_filter.py
+Author : Diego Parra
+Web    : https://diegodebian.online
+─────────────────────────────────────────────────
+
+BloomFilter behaviour and the code filter snapshot format (no database).
+"""
+
+from app.services import code_filter as code_filter_module
+from app.services.code_filter import BloomFilter, CodeFilter
+from app.sharding import NUM_SHARDS, encode_code
+
+
+def make_filter(codes, watermark: int) -> CodeFilter:
+    cf = CodeFilter()
+    cf.bloom = BloomFilter(1000, 0.001)
+    for code in codes:
+        cf.bloom.add(code)
+    cf.watermarks = [watermark] * NUM_SHARDS
+    cf.ready = True
+    return cf
+
+
+def test_bloom_has_no_false_negatives():
+    bloom = BloomFilter(1000, 0.01)
+    keys = [f"code{i}" for i in range(1000)]
+    for key in keys:
+        bloom.add(key)
+    assert all(key in bloom for key in keys)
+    assert bloom.count == 1000
+
+
+def test_bloom_false_positive_rate_near_target():
+    bloom = BloomFilter(2000, 0.01)
+    for i in range(2000):
+        bloom.add(f"in-{i}")
+    false_positives = sum(f"out-{i}" in bloom for i in range(10000))
+    assert false_positives / 10000 < 0.03
+
+
+def test_bloom_sizing():
+    bloom = BloomFilter(1_000_000, 0.001)
+    # ~14.4 bits and ~10 hashes per item for a 0.1% error rate
+    assert 14_000_000 < bloom.num_bits < 15_000_000
+    assert bloom.num_hashes == 10
+    assert len(bloom.bits) == (bloom.num_bits + 7) // 8
+
+
+def test_check_below_and_above_watermark():
+    issued = [encode_code(i, 0) for i in range(1, 50)]
+    cf = make_filter(issued, watermark=100)
+    assert all(cf.might_exist(code) for code in issued)
+    # Not issued, below the watermark: rejected
+    assert not cf.might_exist(encode_code(75, 0))
+    # Above the watermark but within the horizon: let through
+    assert cf.might_exist(encode_code(101, 0))
+    assert not cf.might_exist(encode_code(100 + code_filter_module.CODE_FILTER_HORIZON + 1, 0))
+    assert cf.rejected == 2
+
+
+def test_check_rejects_malformed_codes():
+    cf = make_filter([], watermark=100)
+    assert not cf.might_exist("0abc")            # leading zero digit
+    assert not cf.might_exist("a-b")             # outside the alphabet
+    assert not cf.might_exist("a" * 17)          # longer than the column
+
+
+def test_not_ready_lets_everything_through():
+    cf = CodeFilter()
+    assert cf.might_exist("anything")
+    assert cf.rejected == 0
+
+
+def test_snapshot_round_trip(tmp_path):
+    issued = [encode_code(i, 0) for i in range(1, 200)]
+    cf = make_filter(issued, watermark=199)
+    path = tmp_path / "filter" / "code_filter.bin"
+    cf.save_snapshot(str(path))
+    assert not path.with_suffix(".bin.tmp").exists()
+
+    loaded = CodeFilter()
+    assert loaded.load_snapshot(str(path))
+    assert loaded.watermarks == cf.watermarks
+    assert loaded.bloom.bits == cf.bloom.bits
+    assert loaded.bloom.count == cf.bloom.count
+    assert (loaded.bloom.num_bits, loaded.bloom.num_hashes) == (cf.bloom.num_bits, cf.bloom.num_hashes)
+
+
+def test_snapshot_rejects_missing_truncated_and_foreign_files(tmp_path):
+    cf = CodeFilter()
+    assert not cf.load_snapshot(str(tmp_path / "missing.bin"))
+
+    truncated = tmp_path / "truncated.bin"
+    truncated.write_bytes(b"DDBF\x02")
+    assert not cf.load_snapshot(str(truncated))
+
+    foreign = tmp_path / "foreign.bin"
+    foreign.write_bytes(b"XXXX" + bytes(200))
+    assert not cf.load_snapshot(str(foreign))
+    assert cf.bloom is None
+
+
+def test_snapshot_rejects_other_error_rate(tmp_path, monkeypatch):
+    cf = make_filter(["a"], watermark=1)
+    path = tmp_path / "code_filter.bin"
+    cf.save_snapshot(str(path))
+    monkeypatch.setattr(code_filter_module, "CODE_FILTER_ERROR_RATE", 0.1)
+    assert not CodeFilter().load_snapshot(str(path))
@@ -0,0 +1,71 @@
+"""
+        _~_
+       (o o)   diegodebian
+      /  V  \────────────────────────────────────
+     /(  _  )\  URL Shortener API (MVP)
+       ^^ ^^     FastAPI • PostgreSQL • Docker • Nginx
+
+File   : test_hll.py
+Author : Diego Parra
+Web    : https://diegodebian.online
+─────────────────────────────────────────────────
+
+HyperLogLog register updates, merging and estimates.
+"""
+
+from app import hll
+
+
+def sketch_of(visitors) -> bytes:
+    sketch = hll.empty()
+    for ip, user_agent in visitors:
+        index, rank = hll.register_update(hll.visitor_hash(ip, user_agent))
+        sketch[index] = max(sketch[index], rank)
+    return bytes(sketch)
+
+
+def visitors(start: int, stop: int):
+    return [(f"10.0.{i // 256}.{i % 256}", "Firefox") for i in range(start, stop)]
+
+
+def test_visitor_hash():
+    assert hll.visitor_hash(None, None) is None
+    assert hll.visitor_hash("1.2.3.4", "ua") == hll.visitor_hash("1.2.3.4", "ua")
+    assert hll.visitor_hash("1.2.3.4", "ua") != hll.visitor_hash("1.2.3.5", "ua")
+    assert 0 <= hll.visitor_hash("1.2.3.4", None) < 1 << 64
+
+
+def test_register_update():
+    assert hll.register_update(0) == (0, 64 - hll.PRECISION + 1)
+    assert hll.register_update((1 << 64) - 1) == (hll.NUM_REGISTERS - 1, 1)
+    # Index from the top bits, rank from the leading zeros of the rest
+    assert hll.register_update((5 << (64 - hll.PRECISION)) | 1) == (5, 64 - hll.PRECISION)
+
+
+def test_empty_sketch_estimates_zero():
+    assert hll.estimate(bytes(hll.empty())) == 0
+
+
+def test_estimate_is_within_error_bounds():
+    for count in (10, 1000, 50000):
+        estimate = hll.estimate(sketch_of(visitors(0, count)))
+        # Standard error is ~2.3% with 2048 registers; allow ~3 sigma
+        assert abs(estimate - count) <= max(1, count * 0.07)
+
+
+def test_repeat_visitors_are_counted_once():
+    once = sketch_of(visitors(0, 500))
+    assert sketch_of(visitors(0, 500) * 3) == once
+
+
+def test_merge_equals_sketch_of_the_union():
+    first, second = sketch_of(visitors(0, 3000)), sketch_of(visitors(2000, 5000))
+    merged = hll.merge([first, None, second])
+    assert merged == sketch_of(visitors(0, 5000))
+    assert abs(hll.estimate(merged) - 5000) <= 5000 * 0.07
+
+
+def test_merge_skips_missing_and_malformed_sketches():
+    first = sketch_of(visitors(0, 100))
+    assert hll.merge([None, first, b"short"]) == first
+    assert hll.merge([]) == bytes(hll.NUM_REGISTERS)
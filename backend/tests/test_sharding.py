@@ -0,0 +1,77 @@
+"""
+        _~_
+       (o o)   diegodebian
+      /  V  \────────────────────────────────────
+     /(  _  )\  URL Shortener API (MVP)
+       ^^ ^^     FastAPI • PostgreSQL • Docker • Nginx
+
+File   : test_sharding.py
+Author : Diego Parra
+Web    : https://diegodebian.online
+─────────────────────────────────────────────────
+
+Short code <-> (shard, local id) mapping, with the default single-shard
+layout and with a patched multi-shard one (no databases are opened).
+"""
+
+import pytest
+
+from app import sharding
+from app.sharding import encode_code, shard_for_code, shard_for_user, split_number
+from app.utils import decode_base62, encode_base62
+
+OFFSET = 1_000_000
+
+
+@pytest.fixture
+def four_shards(monkeypatch):
+    """4 shards, 8 code slots, pre-sharding ids below OFFSET."""
+    monkeypatch.setattr(sharding, "NUM_SHARDS", 4)
+    monkeypatch.setattr(sharding, "SHARD_CODE_SLOTS", 8)
+    monkeypatch.setattr(sharding, "SHARD_CODE_OFFSET", OFFSET)
+
+
+def test_default_layout_is_plain_base62(monkeypatch):
+    monkeypatch.setattr(sharding, "NUM_SHARDS", 1)
+    monkeypatch.setattr(sharding, "SHARD_CODE_SLOTS", 1)
+    monkeypatch.setattr(sharding, "SHARD_CODE_OFFSET", 0)
+    for local_id in (1, 61, 62, 12345, 2**40):
+        code = encode_code(local_id, 0)
+        assert code == encode_base62(local_id)
+        assert split_number(decode_base62(code)) == (0, local_id)
+        assert shard_for_code(code) == 0
+    assert shard_for_user("someone@example.com") == 0
+
+
+def test_round_trip_on_every_shard(four_shards):
+    for shard in range(4):
+        for local_id in (1, 2, 999, 10**9):
+            code = encode_code(local_id, shard)
+            assert split_number(decode_base62(code)) == (shard, local_id)
+            assert shard_for_code(code) == shard
+
+
+def test_codes_are_unique_across_shards(four_shards):
+    codes = {encode_code(local_id, shard) for local_id in range(1, 500) for shard in range(4)}
+    assert len(codes) == 499 * 4
+
+
+def test_numbers_below_offset_are_pre_sharding_codes(four_shards):
+    assert split_number(OFFSET - 1) == (0, OFFSET - 1)
+    assert shard_for_code(encode_base62(12345)) == 0
+    assert split_number(OFFSET) == (0, 0)
+
+
+def test_unknown_and_malformed_codes_go_to_shard_zero(four_shards):
+    # A free slot (shard 5) that has no database yet
+    assert split_number(decode_base62(encode_code(7, 5))) == (5, 7)
+    assert shard_for_code(encode_code(7, 5)) == 0
+    assert shard_for_code("bad-code") == 0
+    assert shard_for_code("") == 0
+
+
+def test_shard_for_user_is_stable_and_spread(four_shards):
+    assert shard_for_user("Someone@Example.com") == shard_for_user("someone@example.com")
+    placements = [shard_for_user(f"user{i}@example.com") for i in range(400)]
+    assert set(placements) == {0, 1, 2, 3}
+    assert min(placements.count(shard) for shard in range(4)) > 60
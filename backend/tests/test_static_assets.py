@@ -0,0 +1,136 @@
+"""
+        _~_
+       (o o)   diegodebian
+      /  V  \────────────────────────────────────
+     /(  _  )\  URL Shortener API (MVP)
+       ^^ ^^     FastAPI • PostgreSQL • Docker • Nginx
+
+File   : test_static_assets.py
+Author : Diego Parra
+Web    : https://diegodebian.online
+─────────────────────────────────────────────────
+
+Accept-Encoding negotiation and ETag handling of PrecompressedStatic.
+"""
+
+import asyncio
+import gzip
+
+import brotli
+import pytest
+
+from app.static_assets import PrecompressedStatic, Variant, choose_encoding
+
+ALL = ("identity", "gzip", "br")
+SCRIPT = b"function shorten(url) { return fetch('/api/urls', {method: 'POST'}); }\n" * 50
+
+
+@pytest.mark.parametrize("header, available, expected", [
+    ("", ALL, "identity"),
+    ("gzip, deflate, br", ALL, "br"),
+    ("gzip, deflate, br", ("identity", "gzip"), "gzip"),
+    ("br;q=0.5, gzip", ALL, "gzip"),
+    ("BR;q=1.0, GZIP;q=1.0", ALL, "br"),
+    ("*", ALL, "br"),
+    ("gzip;q=0, *;q=0.3", ALL, "br"),
+    ("br;q=0, gzip;q=0", ALL, "identity"),
+    ("identity;q=0, gzip;q=0, br;q=0", ALL, "identity"),
+    ("gzip;q=bogus", ALL, "identity"),
+    ("deflate", ALL, "identity"),
+])
+def test_choose_encoding(header, available, expected):
+    assert choose_encoding(header, available) == expected
+
+
+def test_matches_only_the_served_variant():
+    br = Variant("br", b"", b'"abc-br"')
+    assert PrecompressedStatic._matches(b'"abc-br"', br)
+    assert PrecompressedStatic._matches(b'W/"abc-br"', br)
+    assert PrecompressedStatic._matches(b'"old", "abc-br"', br)
+    assert PrecompressedStatic._matches(b" * ", br)
+    assert not PrecompressedStatic._matches(b'"abc"', br)
+    assert not PrecompressedStatic._matches(b'"abc-gzip"', br)
+
+
+@pytest.fixture
+def static(tmp_path):
+    directory = tmp_path / "static"
+    directory.mkdir()
+    (directory / "app.js").write_bytes(SCRIPT)
+    (directory / "logo.png").write_bytes(b"\x89PNG" + bytes(2000))
+    return PrecompressedStatic(str(directory), cache_dir=str(tmp_path / "cache"), brotli_quality=5)
+
+
+def get(app, path: str, headers=(), query: bytes = b""):
+    messages = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        messages.append(message)
+
+    scope = {"type": "http", "method": "GET", "path": path, "root_path": "", "query_string": query,
+             "headers": [(name.encode(), value.encode()) for name, value in headers]}
+    asyncio.run(app(scope, receive, send))
+    return messages[0]["status"], dict(messages[0]["headers"]), messages[1]["body"]
+
+
+def test_serves_precompressed_variants(static):
+    status, headers, body = get(static, "/app.js", [("accept-encoding", "gzip, br")])
+    assert status == 200
+    assert headers[b"content-encoding"] == b"br"
+    assert brotli.decompress(body) == SCRIPT
+
+    status, headers, body = get(static, "/app.js", [("accept-encoding", "gzip")])
+    assert headers[b"content-encoding"] == b"gzip"
+    assert gzip.decompress(body) == SCRIPT
+    assert headers[b"vary"] == b"Accept-Encoding"
+
+
+def test_binary_assets_are_not_compressed(static):
+    assert list(static.assets["logo.png"].variants) == ["identity"]
+    _, headers, _ = get(static, "/logo.png", [("accept-encoding", "br")])
+    assert b"content-encoding" not in headers
+
+
+def test_conditional_requests_compare_the_selected_variant(static):
+    _, headers, _ = get(static, "/app.js", [("accept-encoding", "br")])
+    br_etag = headers[b"etag"].decode()
+
+    status, _, body = get(static, "/app.js", [("accept-encoding", "br"), ("if-none-match", br_etag)])
+    assert (status, body) == (304, b"")
+    # A cached br copy must not validate a gzip response
+    status, _, _ = get(static, "/app.js", [("accept-encoding", "gzip"), ("if-none-match", br_etag)])
+    assert status == 200
+
+
+def test_versioned_urls_are_immutable(static):
+    version = static.assets["app.js"].version
+    assert static.url("app.js") == f"/static/app.js?v={version}"
+    _, headers, _ = get(static, "/app.js", query=f"v={version}".encode())
+    assert b"immutable" in headers[b"cache-control"]
+    _, headers, _ = get(static, "/app.js", query=b"v=stale")
+    assert b"immutable" not in headers[b"cache-control"]
+
+
+def test_prebuilt_variants_are_used(tmp_path, static):
+    version = static.assets["app.js"].version
+    prebuilt = tmp_path / "prebuilt"
+    prebuilt.mkdir()
+    marker = brotli.compress(SCRIPT, quality=11)
+    (prebuilt / f"{version}.br").write_bytes(marker)
+
+    rebuilt = PrecompressedStatic(str(static.directory), prebuilt_dir=str(prebuilt), brotli_quality=1)
+    assert rebuilt.assets["app.js"].variants["br"].body == marker
+
+
+def test_unknown_paths_and_methods(static):
+    assert get(static, "/missing.js")[0] == 404
+    messages = []
+
+    async def send(message):
+        messages.append(message)
+
+    asyncio.run(static({"type": "http", "method": "POST", "path": "/app.js", "headers": []}, None, send))
+    assert messages[0]["status"] == 405
@@ -0,0 +1,74 @@
+"""
+        _~_
+       (o o)   diegodebian
+      /  V  \────────────────────────────────────
+     /(  _  )\  URL Shortener API (MVP)
+       ^^ ^^     FastAPI • PostgreSQL • Docker • Nginx
+
+File   : test_stats_window.py
+Author : Diego Parra
+Web    : https://diegodebian.online
+─────────────────────────────────────────────────
+
+plan_window: range and granularity resolution for stats queries.
+"""
+
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from fastapi import HTTPException
+
+from app.services.stats_service import STATS_MAX_POINTS, _points, plan_window
+
+TO = datetime(2024, 6, 15, 12, 30)
+CREATED = datetime(2020, 1, 1)
+
+
+def test_defaults_to_daily_for_the_most_recent_days():
+    from_, to, granularity = plan_window(CREATED, None, TO, None)
+    assert granularity == "day"
+    assert to == TO
+    assert from_ == TO - timedelta(days=STATS_MAX_POINTS - 1)
+    assert _points(from_, to, granularity) <= STATS_MAX_POINTS
+
+
+def test_default_range_starts_at_creation_when_newer():
+    created = TO - timedelta(days=3)
+    from_, _, granularity = plan_window(created, None, TO, None)
+    assert (from_, granularity) == (created, "day")
+
+
+def test_picks_finest_granularity_that_fits():
+    assert plan_window(CREATED, TO - timedelta(hours=2), TO, None)[2] == "minute"
+    assert plan_window(CREATED, TO - timedelta(days=3), TO, None)[2] == "hour"
+    assert plan_window(CREATED, TO - timedelta(days=100), TO, None)[2] == "day"
+    assert plan_window(CREATED, TO - timedelta(days=1000), TO, None)[2] == "week"
+
+
+def test_coarsens_a_requested_granularity_that_is_too_fine():
+    from_ = TO - timedelta(days=15)
+    assert plan_window(CREATED, from_, TO, "minute") == (from_, TO, "hour")
+    # A coarser request than needed is kept
+    assert plan_window(CREATED, from_, TO, "day") == (from_, TO, "day")
+
+
+def test_moves_start_forward_when_even_weeks_are_too_fine():
+    from_, to, granularity = plan_window(CREATED, TO - timedelta(weeks=STATS_MAX_POINTS * 2), TO, None)
+    assert granularity == "week"
+    assert from_ == TO - timedelta(weeks=STATS_MAX_POINTS - 1)
+    assert _points(from_, to, granularity) <= STATS_MAX_POINTS
+
+
+def test_aware_datetimes_are_converted_to_naive_utc():
+    from_ = datetime(2024, 6, 15, 10, 0, tzinfo=timezone(timedelta(hours=2)))
+    to = datetime(2024, 6, 15, 12, 0, tzinfo=timezone.utc)
+    resolved_from, resolved_to, granularity = plan_window(CREATED, from_, to, None)
+    assert resolved_from == datetime(2024, 6, 15, 8, 0)
+    assert resolved_to == datetime(2024, 6, 15, 12, 0)
+    assert granularity == "minute"
+
+
+def test_rejects_empty_range():
+    with pytest.raises(HTTPException) as exc_info:
+        plan_window(CREATED, TO, TO - timedelta(hours=1), None)
+    assert exc_info.value.status_code == 422
@@ -0,0 +1,31 @@
+-- Migration: Add click_rollups table for time-range stats
+-- Date: 2026-10-19
+-- Purpose: Per-URL click counts at minute/hour/day resolution so the stats
+--          endpoint never scans the clicks table.
+--
+-- Run BEFORE deploying the backend that writes rollups, so the backfill
+-- below does not overlap with live ingestion.
+
+CREATE TABLE IF NOT EXISTS click_rollups (
+    url_id INTEGER NOT NULL REFERENCES urls (id) ON DELETE CASCADE,
+    resolution VARCHAR(6) NOT NULL,
+    bucket TIMESTAMP NOT NULL,
+    clicks INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (url_id, resolution, bucket)
+);
+
+-- Backfill from existing clicks
+INSERT INTO click_rollups (url_id, resolution, bucket, clicks)
+SELECT url_id, 'minute', DATE_TRUNC('minute', event_time), COUNT(*)
+FROM clicks GROUP BY url_id, DATE_TRUNC('minute', event_time)
+ON CONFLICT DO NOTHING;
+
+INSERT INTO click_rollups (url_id, resolution, bucket, clicks)
+SELECT url_id, 'hour', DATE_TRUNC('hour', event_time), COUNT(*)
+FROM clicks GROUP BY url_id, DATE_TRUNC('hour', event_time)
+ON CONFLICT DO NOTHING;
+
+INSERT INTO click_rollups (url_id, resolution, bucket, clicks)
+SELECT url_id, 'day', DATE_TRUNC('day', event_time), COUNT(*)
+FROM clicks GROUP BY url_id, DATE_TRUNC('day', event_time)
+ON CONFLICT DO NOTHING;
@@ -0,0 +1,7 @@
+-- Migration: Add HyperLogLog visitor sketches to daily click rollups
+-- Date: 2026-10-19
+-- Purpose: Approximate unique-visitor counts without COUNT(DISTINCT) over clicks.
+--          Sketches are 2048-byte registers, filled from new clicks only
+--          (existing clicks have no visitor key to rebuild them from).
+
+ALTER TABLE click_rollups ADD COLUMN IF NOT EXISTS visitors BYTEA;
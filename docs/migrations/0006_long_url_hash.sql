@@ -0,0 +1,15 @@
+-- Migration: Add long_url_hash for long-URL deduplication
+-- Date: 2026-10-19
+-- Purpose: Fixed-width hash of urls.long_url (first 8 bytes of SHA-256 as a
+--          signed bigint, same as app/utils.py:long_url_hash) with a
+--          (user_email, long_url_hash) index, so repeat submissions are
+--          found in one indexed lookup.
+
+ALTER TABLE urls ADD COLUMN IF NOT EXISTS long_url_hash BIGINT;
+
+-- Backfill existing rows
+UPDATE urls
+SET long_url_hash = ('x' || substr(encode(sha256(convert_to(long_url, 'UTF8')), 'hex'), 1, 16))::bit(64)::bigint
+WHERE long_url_hash IS NULL;
+
+CREATE INDEX IF NOT EXISTS ix_urls_user_email_long_url_hash ON urls (user_email, long_url_hash);
@@ -0,0 +1,10 @@
+-- Migration: Idempotency key for spooled click events
+-- Date: 2026-10-19
+-- Purpose: The click spool replayer inserts with ON CONFLICT (event_id) DO NOTHING,
+--          so a segment replayed twice after a crash adds no duplicate clicks.
+--          Existing rows keep NULL (NULLs never conflict in a unique index).
+
+ALTER TABLE clicks ADD COLUMN IF NOT EXISTS event_id VARCHAR(32);
+
+-- CONCURRENTLY: don't block click inserts while the index builds (run outside a transaction)
+CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS clicks_event_id_key ON clicks (event_id);
@@ -0,0 +1,296 @@
+#!/usr/bin/env python3
+"""
+Admin script for bulk plan changes and URL moderation.
+
+Usage:
+  python scripts/bulk_admin.py plans --file plans.csv          # columns: email,plan
+  python scripts/bulk_admin.py plans --plan free --email-domain spam.example
+  python scripts/bulk_admin.py urls --file codes.ndjson        # {"short_code": "...", "is_active": false}
+  python scripts/bulk_admin.py urls --disable --user spammer@example.com
+  python scripts/bulk_admin.py urls --disable --domain bad.example --created-from 2026-01-01
+
+Options:
+  --file PATH            CSV (with header) or NDJSON (.ndjson/.jsonl) input
+  --chunk-size N         Rows per UPDATE / transaction (default 1000)
+  --dry-run              Only report how many rows would change
+
+File input is loaded with COPY into a temp table, then applied in chunked
+UPDATE .. FROM joins (one short transaction per chunk). Filter input is
+applied in keyset-paginated chunks. Progress is printed after every chunk.
+
+URL changes run on every shard database (DB_NAME plus SHARD_DB_NAMES, as
+in the app); each short code only exists on one of them. Plan changes only
+touch DB_NAME, which holds the users table.
+
+Reads DB_* and SHARD_DB_* settings from environment. Does NOT print
+sensitive values.
+"""
+
+import argparse
+import asyncio
+import csv
+import json
+import os
+import sys
+import time
+from datetime import datetime
+
+# Build DATABASE_URL from individual env vars (same as app/core/config.py)
+DB_HOST = os.getenv("DB_HOST", "localhost")
+DB_PORT = os.getenv("DB_PORT", "5432")
+DB_USER = os.getenv("DB_USER", "shortener_user")
+DB_PASSWORD = os.getenv("DB_PASSWORD", "shortener_pass_123")
+DB_NAME = os.getenv("DB_NAME", "shortener")
+
+DATABASE_URL = f"postgresql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+
+# Extra shard databases for urls (same as SHARD_DATABASE_URLS in app/core/config.py)
+SHARD_DB_NAMES = [name.strip() for name in os.getenv("SHARD_DB_NAMES", "").split(",") if name.strip()]
+SHARD_DB_HOSTS = [host.strip() for host in os.getenv("SHARD_DB_HOSTS", "").split(",") if host.strip()]
+SHARD_DATABASES = [(DB_NAME, DATABASE_URL)] + [
+    (name, f"postgresql://{DB_USER}:{DB_PASSWORD}@"
+           f"{SHARD_DB_HOSTS[i] if i < len(SHARD_DB_HOSTS) else DB_HOST}:{DB_PORT}/{name}")
+    for i, name in enumerate(SHARD_DB_NAMES)
+]
+
+VALID_PLANS = ("free", "premium", "admin")
+TRUE_VALUES = ("1", "true", "yes", "on")
+FALSE_VALUES = ("0", "false", "no", "off")
+
+# key column, value column, value type and SQL for each target
+TARGETS = {
+    "plans": {
+        "table": "users",
+        "key": "email",
+        "value": "plan",
+        "value_type": "varchar",
+    },
+    "urls": {
+        "table": "urls",
+        "key": "short_code",
+        "value": "is_active",
+        "value_type": "boolean",
+    },
+}
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Bulk plan changes and URL moderation")
+    sub = parser.add_subparsers(dest="target", required=True)
+
+    plans = sub.add_parser("plans", help="Change user plans")
+    plans.add_argument("--plan", choices=VALID_PLANS, help="Plan to set (filter mode)")
+    plans.add_argument("--email-domain", help="Filter: users with emails @this domain")
+    plans.add_argument("--current-plan", choices=VALID_PLANS, help="Filter: users currently on this plan")
+
+    urls = sub.add_parser("urls", help="Enable or disable URLs")
+    state = urls.add_mutually_exclusive_group()
+    state.add_argument("--disable", dest="is_active", action="store_false", default=None)
+    state.add_argument("--enable", dest="is_active", action="store_true")
+    urls.add_argument("--user", help="Filter: URLs owned by this email")
+    urls.add_argument("--domain", help="Filter: long URLs on this domain (and subdomains)")
+
+    for p in (plans, urls):
+        p.add_argument("--file", help="CSV or NDJSON input file")
+        p.add_argument("--created-from", type=datetime.fromisoformat, help="Filter: created at or after")
+        p.add_argument("--created-to", type=datetime.fromisoformat, help="Filter: created before")
+        p.add_argument("--chunk-size", type=int, default=1000)
+        p.add_argument("--dry-run", action="store_true")
+    return parser.parse_args()
+
+
+def read_items(path: str, target: dict) -> list:
+    """Read (key, value) pairs from a CSV or NDJSON file, validating values."""
+    with open(path, encoding="utf-8-sig") as f:
+        if path.endswith((".ndjson", ".jsonl")):
+            rows = [json.loads(line) for line in f if line.strip()]
+        else:
+            rows = list(csv.DictReader(f))
+
+    items = []
+    for line_no, row in enumerate(rows, start=1):
+        key, value = row.get(target["key"]), row.get(target["value"])
+        if not key or value is None:
+            sys.exit(f"Error: row {line_no} needs '{target['key']}' and '{target['value']}'")
+        if target["value_type"] == "boolean":
+            text_value = str(value).strip().lower()
+            if text_value not in TRUE_VALUES + FALSE_VALUES:
+                sys.exit(f"Error: row {line_no} has invalid {target['value']} '{value}'")
+            value = text_value in TRUE_VALUES
+        elif value not in VALID_PLANS:
+            sys.exit(f"Error: row {line_no} has invalid plan '{value}'")
+        items.append((key.strip(), value))
+    return items
+
+
+def escape_like(value: str) -> str:
+    """Escape LIKE wildcards so the value only matches literally."""
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def filter_clause(args: argparse.Namespace) -> tuple:
+    """Build the WHERE clause and params for filter mode."""
+    conditions, params = [], []
+
+    def add(sql: str, value) -> None:
+        params.append(value)
+        conditions.append(sql.format(f"${len(params)}"))
+
+    if args.created_from:
+        add("created_at >= {}", args.created_from)
+    if args.created_to:
+        add("created_at < {}", args.created_to)
+    if args.target == "plans":
+        if args.email_domain:
+            add("email ILIKE {} ESCAPE '\\'", f"%@{escape_like(args.email_domain.lstrip('@'))}")
+        if args.current_plan:
+            add("plan = {}", args.current_plan)
+    else:
+        if args.user:
+            add("user_email = {}", args.user)
+        if args.domain:
+            domain = args.domain.lower().lstrip(".")
+            host = r"lower(substring(long_url FROM '^[A-Za-z][A-Za-z0-9+.-]*://([^/:?#]+)'))"
+            params += [domain, "%." + escape_like(domain)]
+            n = len(params)
+            conditions.append(f"({host} = ${n - 1} OR {host} LIKE ${n} ESCAPE '\\')")
+    return conditions, params
+
+
+def progress(done: int, total: int, changed: int, started: float) -> None:
+    rate = done / max(time.monotonic() - started, 1e-6)
+    total_text = f"/{total}" if total else ""
+    print(f"  processed {done}{total_text}, changed {changed} ({rate:,.0f} rows/s)", flush=True)
+
+
+async def apply_file(conn, args: argparse.Namespace, target: dict, items: list) -> tuple:
+    """Apply the items on one database. Returns (rows changed or that would change, keys found)."""
+    # COPY the input into a temp table, then join against it chunk by chunk
+    await conn.execute(
+        f"CREATE TEMP TABLE bulk_input (ord INTEGER PRIMARY KEY, key VARCHAR NOT NULL, "
+        f"value {target['value_type']} NOT NULL)"
+    )
+    await conn.copy_records_to_table(
+        "bulk_input",
+        records=[(i, key, value) for i, (key, value) in enumerate(items)],
+        columns=["ord", "key", "value"],
+    )
+    found = {row["key"] for row in await conn.fetch(
+        f"SELECT DISTINCT b.key FROM bulk_input b WHERE EXISTS "
+        f"(SELECT 1 FROM {target['table']} t WHERE t.{target['key']} = b.key)"
+    )}
+
+    if args.dry_run:
+        would = await conn.fetchval(
+            f"SELECT count(*) FROM {target['table']} t JOIN bulk_input b ON t.{target['key']} = b.key "
+            f"WHERE t.{target['value']} IS DISTINCT FROM b.value"
+        )
+        print(f"Dry run: {would} rows would change.")
+        return would, found
+
+    started, changed = time.monotonic(), 0
+    for start in range(0, len(items), args.chunk_size):
+        async with conn.transaction():
+            status = await conn.execute(
+                f"UPDATE {target['table']} t SET {target['value']} = b.value FROM bulk_input b "
+                f"WHERE t.{target['key']} = b.key AND b.ord >= $1 AND b.ord < $2 "
+                f"AND t.{target['value']} IS DISTINCT FROM b.value",
+                start, start + args.chunk_size,
+            )
+        changed += int(status.split()[-1])
+        progress(min(start + args.chunk_size, len(items)), len(items), changed, started)
+    print(f"{changed} rows changed in {time.monotonic() - started:.1f}s.")
+    return changed, found
+
+
+async def apply_filter(conn, args: argparse.Namespace, target: dict, value) -> int:
+    """Apply the filter update on one database. Returns rows changed (or matching, in a dry run)."""
+    conditions, params = filter_clause(args)
+    value_param = f"${len(params) + 1}"
+    where = " AND ".join(conditions + [f"{target['value']} IS DISTINCT FROM {value_param}"])
+    params.append(value)
+
+    total = await conn.fetchval(f"SELECT count(*) FROM {target['table']} WHERE {where}", *params)
+    print(f"{total} rows match the filter.")
+    if args.dry_run or not total:
+        return total
+
+    started, changed, last_id = time.monotonic(), 0, 0
+    while True:
+        async with conn.transaction():
+            rows = await conn.fetch(
+                f"UPDATE {target['table']} SET {target['value']} = {value_param} WHERE id IN ("
+                f"SELECT id FROM {target['table']} WHERE {where} AND id > ${len(params) + 1} "
+                f"ORDER BY id LIMIT ${len(params) + 2}) RETURNING id",
+                *params, last_id, args.chunk_size,
+            )
+        if not rows:
+            break
+        changed += len(rows)
+        last_id = max(row["id"] for row in rows)
+        progress(changed, total, changed, started)
+    print(f"{changed} rows changed in {time.monotonic() - started:.1f}s.")
+    return changed
+
+
+async def main() -> None:
+    args = parse_args()
+    target = TARGETS[args.target]
+    value = args.plan if args.target == "plans" else args.is_active
+
+    if args.file and value is not None:
+        sys.exit("Error: use either --file or a value with filters, not both")
+    if not args.file and value is None:
+        sys.exit("Error: give --file, or --plan/--enable/--disable with filter options")
+    if not args.file and not filter_clause(args)[0]:
+        sys.exit("Error: filter mode needs at least one filter option (refusing to update every row)")
+
+    # Only import after we know args are valid
+    try:
+        import asyncpg
+    except ImportError:
+        sys.exit("Error: asyncpg not installed. Run: pip install asyncpg")
+
+    items = read_items(args.file, target) if args.file else None
+    if items is not None:
+        print(f"Loaded {len(items)} rows from {args.file}")
+
+    # users only live on DB_NAME; urls are spread over every shard
+    databases = SHARD_DATABASES if args.target == "urls" else SHARD_DATABASES[:1]
+    # Connect to every database up front so an unreachable shard aborts before any change
+    connections = []
+    try:
+        for name, url in databases:
+            print(f"Connecting to database {name}...")
+            try:
+                connections.append(await asyncpg.connect(url))
+            except Exception as e:
+                print(f"Error connecting to database {name}: {e}")
+                print("Hint: Make sure DB_HOST, DB_PORT, DB_USER, DB_PASSWORD, DB_NAME "
+                      "(and SHARD_DB_NAMES / SHARD_DB_HOSTS) are set correctly.")
+                sys.exit(1)
+
+        total, found = 0, set()
+        for (name, _), conn in zip(databases, connections):
+            if len(databases) > 1:
+                print(f"\n[{name}]")
+            if items is not None:
+                changed, shard_found = await apply_file(conn, args, target, items)
+                found |= shard_found
+            else:
+                changed = await apply_filter(conn, args, target, value)
+            total += changed
+    finally:
+        for conn in connections:
+            await conn.close()
+
+    if items is not None:
+        missing = sum(1 for key, _ in items if key not in found)
+        if missing:
+            print(f"Warning: {missing} rows reference unknown {target['key']} values")
+    verb = "would change" if args.dry_run else "changed"
+    print(f"\nSUCCESS: {total} rows {verb} across {len(databases)} database(s).")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())